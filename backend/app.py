@@ -2,19 +2,42 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import base64
 import traceback
+import atexit
 import multiprocessing
-import queue
+import os
+import threading
 from kolampython import generate_kolam_image
+from renderer_pool import RendererPool, PoolBusyError, RenderTimeoutError, RenderError
 
 app = Flask(__name__)
 CORS(app) # Enable CORS for all routes
 
-def kolam_generation_worker(axiom, rules, angle, dot_size, iterations, result_queue):
-    try:
-        png_data = generate_kolam_image(axiom, rules, angle, dot_size, iterations)
-        result_queue.put({"image": png_data})
-    except Exception as e:
-        result_queue.put({"error": str(e), "traceback": traceback.format_exc()})
+# Renderer workers are started on first use rather than at import time, so
+# spawned child processes (Windows, macOS) can import this module safely
+RENDERER_WORKERS = int(os.environ.get("KOLAM_RENDERER_WORKERS", 2))
+RENDERER_MAX_JOBS = int(os.environ.get("KOLAM_RENDERER_MAX_JOBS", 100))
+RENDERER_TIMEOUT = float(os.environ.get("KOLAM_RENDERER_TIMEOUT", 30))
+
+renderer_pool = None
+renderer_pool_lock = threading.Lock()
+
+# Runs once in every renderer worker so imports and caches are warm before the
+# first real job
+def warm_up_renderer():
+    generate_kolam_image("FBFBFBFB", {"A": "AFBFA", "B": "AFBFBFBFA"}, 45, 10, 1, size=64)
+
+def get_renderer_pool():
+    global renderer_pool
+    with renderer_pool_lock:
+        if renderer_pool is None:
+            renderer_pool = RendererPool(
+                size=RENDERER_WORKERS,
+                max_jobs_per_worker=RENDERER_MAX_JOBS,
+                timeout=RENDERER_TIMEOUT,
+                initializer=warm_up_renderer,
+            )
+            atexit.register(renderer_pool.shutdown)
+        return renderer_pool
 
 @app.route('/generate-kolam', methods=['POST'])
 def generate_kolam():
@@ -26,39 +49,28 @@ def generate_kolam():
     dot_size = data.get("dot_size", 10)
     iterations = data.get("iterations", 2)
     
-    result_queue = multiprocessing.Queue()
-    process = multiprocessing.Process(
-        target=kolam_generation_worker,
-        args=(axiom, rules, angle, dot_size, iterations, result_queue)
-    )
-    process.start()
-    
     try:
-        # Wait for the process to complete with a timeout
-        result = result_queue.get(timeout=30) # 30-second timeout
-        
-        if "image" in result:
-            png_data = result["image"]
-            encoded_image = base64.b64encode(png_data).decode('utf-8')
-            return jsonify({"image": encoded_image}), 200
-        else:
-            # An error occurred in the worker process
-            app.logger.error("Error from kolam generation worker: %s", result["traceback"])
-            return jsonify({"error": result["error"], "traceback": result["traceback"]}), 500
-            
-    except queue.Empty:
-        process.terminate()
-        process.join()
-        error_msg = "Kolam generation timed out."
-        app.logger.error(error_msg)
-        return jsonify({"error": error_msg}), 500
+        png_data = get_renderer_pool().run(generate_kolam_image, axiom, rules, angle, dot_size, iterations)
+        encoded_image = base64.b64encode(png_data).decode('utf-8')
+        return jsonify({"image": encoded_image}), 200
+    except PoolBusyError as e:
+        app.logger.error(str(e))
+        return jsonify({"error": str(e)}), 503
+    except RenderTimeoutError as e:
+        app.logger.error(str(e))
+        return jsonify({"error": str(e)}), 500
+    except RenderError as e:
+        # An error occurred in the worker process
+        app.logger.error("Error from kolam generation worker: %s", e.worker_traceback)
+        return jsonify({"error": str(e), "traceback": e.worker_traceback}), 500
     except Exception as e:
         app.logger.error("Error in main Flask process: %s", traceback.format_exc())
         return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
-    finally:
-        if process.is_alive():
-            process.terminate()
-            process.join()
+
+# Health of the renderer workers
+@app.route('/status', methods=['GET'])
+def status():
+    return jsonify(get_renderer_pool().status()), 200
 
 if __name__ == '__main__':
     # This is important for multiprocessing on Windows
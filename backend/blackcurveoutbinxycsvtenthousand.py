@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
-import csv
+
+from pixel_coords import extract_coordinates, save_coordinates, trace_coordinates
 
 def convert_image_to_binary(image_path):
     # Read the image
@@ -11,21 +12,20 @@ def convert_image_to_binary(image_path):
 
     return binary_image
 
-def export_coordinates(binary_image, output_csv, max_points=10000):
-    # Find white pixel coordinates
-    white_pixels = np.where(binary_image == 255)
+def export_coordinates(binary_image, output_path, max_points=10000, trace=False):
+    if trace:
+        # Trace the white strokes in drawing order, resampled to max_points
+        points = trace_coordinates(binary_image, 'white', max_points=max_points)
+    else:
+        # Find white pixel coordinates
+        points = extract_coordinates(binary_image, 'white', max_points=0)
 
-    # Limit the number of points to export
-    if len(white_pixels[0]) > max_points:
-        indices = np.random.choice(len(white_pixels[0]), max_points, replace=False)
-        white_pixels = (white_pixels[0][indices], white_pixels[1][indices])
+        # Limit the number of points to export
+        if len(points) > max_points:
+            points = points[np.random.choice(len(points), max_points, replace=False)]
 
-    # Write coordinates to CSV
-    with open(output_csv, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['x', 'y'])
-        for x, y in zip(white_pixels[1], white_pixels[0]):
-            writer.writerow([x, y])
+    # Write coordinates as CSV, .npy, raw int32 (.i32) or Parquet, by extension
+    save_coordinates(points, output_path)
 
 # Path to input image
 image_path = '/home/josva/kollamms turtle/correct-code-colour-kolam-kolamsingleknot/binary_image.png'
@@ -36,7 +36,7 @@ output_csv = 'output_coordinates.csv'
 # Convert image to binary
 binary_image = convert_image_to_binary(image_path)
 
-# Export coordinates to CSV
+# Export coordinates to CSV (trace=True for ordered points along the strokes)
 export_coordinates(binary_image, output_csv)
 
 # Save the binary image
@@ -0,0 +1,215 @@
+import queue
+import threading
+import time
+
+import cv2
+
+# Capture / process / display / write pipeline for the camera scripts.
+#
+# Reading, drawing, showing and encoding one after the other in a single loop
+# means a slow VideoWriter.write or draw holds up the camera. Here a capture
+# thread reads frames into a small bounded queue; for a live camera a full
+# queue drops its oldest frame, so processing always gets the latest one
+# instead of falling further and further behind. Processing and display run on
+# the calling thread (cv2.imshow and waitKey have to), and finished frames go
+# to a writer thread through their own queue. For a video file source nothing
+# is dropped, so every frame of the file is processed; that makes the pipeline
+# easy to run without a camera.
+#
+# stats() reports frames per second, dropped frames, queue depths and, per
+# stage (capture, process, display, write), the frame count and the mean and
+# last latency in milliseconds.
+
+
+# Encodes frames with cv2.VideoWriter on a background thread. write() only
+# queues the frame (blocking while write_queue_size frames are waiting); the
+# writer is opened with the size of the first frame.
+class AsyncVideoWriter:
+    def __init__(self, path, fps=30.0, fourcc="mp4v", queue_size=32):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.frames = 0
+        self.total_seconds = 0.0
+        self.last_seconds = 0.0
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _write_loop(self):
+        writer = None
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            if writer is None:
+                height, width = frame.shape[:2]
+                writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (width, height))
+            start = time.perf_counter()
+            writer.write(frame)
+            self.last_seconds = time.perf_counter() - start
+            self.total_seconds += self.last_seconds
+            self.frames += 1
+        if writer is not None:
+            writer.release()
+
+    # Queues a frame; the caller must not modify it afterwards
+    def write(self, frame):
+        self.queue.put(frame)
+
+    # Waits for the queued frames to be written and closes the file
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FramePipeline:
+    def __init__(self, source=0, process=None, output=None, fps=None, fourcc="mp4v", window="Video Stream",
+                 on_key=None, queue_size=2, drop_stale=None, capture_size=None, write_queue_size=32):
+        self.source = source
+        self.process = process
+        self.output = output
+        self.fps = fps
+        self.fourcc = fourcc
+        self.write_queue_size = write_queue_size
+        self.window = window
+        self.on_key = on_key
+        # Drop stale frames from live cameras, keep every frame of a file
+        self.drop_stale = isinstance(source, int) if drop_stale is None else drop_stale
+        self.capture_size = capture_size
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._stop = threading.Event()
+        self._captured = threading.Event()
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._started = None
+        self._finished = None
+        self.frames = 0
+        self.dropped = 0
+
+    def _record(self, stage, start):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            count, total, _ = self._stages.get(stage, (0, 0.0, 0.0))
+            self._stages[stage] = (count + 1, total + elapsed, elapsed)
+
+    def _capture_loop(self, capture):
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                self._record("capture", start)
+                if self.drop_stale:
+                    while True:
+                        try:
+                            self._frames.put_nowait(frame)
+                            break
+                        except queue.Full:
+                            try:
+                                self._frames.get_nowait()
+                                with self._lock:
+                                    self.dropped += 1
+                            except queue.Empty:
+                                pass
+                else:
+                    while not self._stop.is_set():
+                        try:
+                            self._frames.put(frame, timeout=0.1)
+                            break
+                        except queue.Full:
+                            pass
+        finally:
+            self._captured.set()
+
+    def _next_frame(self):
+        while True:
+            try:
+                return self._frames.get(timeout=0.05)
+            except queue.Empty:
+                if self._captured.is_set() and self._frames.empty():
+                    return None
+
+    # Runs until the source ends or 'q' is pressed (or on_key returns True for
+    # a key), then returns stats()
+    def run(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            raise IOError(f"Could not open video source {self.source!r}")
+        if self.capture_size is not None:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.capture_size[0])
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.capture_size[1])
+        fps = self.fps or capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+        capture_thread = threading.Thread(target=self._capture_loop, args=(capture,), daemon=True)
+        if self.output:
+            self._writer = AsyncVideoWriter(self.output, fps, self.fourcc, self.write_queue_size)
+        self._started = time.perf_counter()
+        capture_thread.start()
+        try:
+            while True:
+                frame = self._next_frame()
+                if frame is None:
+                    break
+                start = time.perf_counter()
+                if self.process is not None:
+                    frame = self.process(frame)
+                self._record("process", start)
+                if self._writer is not None:
+                    self._writer.write(frame)
+                self.frames += 1
+
+                if self.window:
+                    start = time.perf_counter()
+                    cv2.imshow(self.window, frame)
+                    key = cv2.waitKey(1) & 0xFF
+                    self._record("display", start)
+                    if key == ord("q") or (key != 0xFF and self.on_key is not None and self.on_key(key)):
+                        break
+        finally:
+            self._stop.set()
+            capture_thread.join()
+            capture.release()
+            if self._writer is not None:
+                self._writer.close()
+            if self.window:
+                cv2.destroyWindow(self.window)
+            self._finished = time.perf_counter()
+        return self.stats()
+
+    def stats(self):
+        end = self._finished or time.perf_counter()
+        elapsed = end - self._started if self._started is not None else 0.0
+        with self._lock:
+            stages = {
+                name: {
+                    "frames": count,
+                    "mean_ms": round(total / count * 1000, 2),
+                    "last_ms": round(last * 1000, 2),
+                }
+                for name, (count, total, last) in self._stages.items()
+            }
+            writer = self._writer
+            if writer is not None and writer.frames:
+                stages["write"] = {
+                    "frames": writer.frames,
+                    "mean_ms": round(writer.total_seconds / writer.frames * 1000, 2),
+                    "last_ms": round(writer.last_seconds * 1000, 2),
+                }
+            return {
+                "fps": round(self.frames / elapsed, 2) if elapsed > 0 else 0.0,
+                "frames": self.frames,
+                "dropped": self.dropped,
+                "queue_depth": self._frames.qsize(),
+                "write_queue_depth": writer.queue.qsize() if writer is not None else 0,
+                "stages": stages,
+            }
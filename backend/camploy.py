@@ -1,10 +1,12 @@
 import cv2
 import numpy as np
-import pandas as pd
 
-# Load CSV data
+from pixel_coords import load_coordinates
+from point_overlay import PointOverlay
+
+# Load point data (.csv, or .npy / .i32 which are memory-mapped, not parsed)
 csv_file = '/home/josva/kollamms turtle/latest-correct-code-colour-kolam-kolamsingleknot/output_coordinates.csv'  # Path to your CSV file
-data = pd.read_csv(csv_file)
+data = load_coordinates(csv_file)
 
 # Initialize video capture
 cap = cv2.VideoCapture(0)  # Change to the appropriate video source if needed
@@ -14,6 +16,9 @@ circle_radius = 10
 circle_thickness = 2
 circle_color = (0, 0, 255)  # Red color (BGR format)
 
+# All points drawn once into a layer that is pasted onto every frame
+overlay = PointOverlay(data, circle_radius, circle_color, circle_thickness)
+
 # Initialize current row index
 current_row = 0
 
@@ -23,10 +28,13 @@ while True:
     if not ret:
         break
     
-    # Get current X, Y coordinates from the CSV data
-    for x, y in data.values:
-        # Draw big red circle at the specified coordinates
-        cv2.circle(frame, (x, y), circle_radius, circle_color, circle_thickness)
+    # Draw big red circles at all the coordinates from the CSV data
+    overlay.composite(frame)
+
+    # Draw the current point on top
+    if len(data):
+        current_x, current_y = (int(v) for v in data[current_row])
+        cv2.circle(frame, (current_x, current_y), circle_radius + 5, (255, 0, 0), -1)
 
     # Show the frame
     cv2.imshow('Video Stream', frame)
@@ -1,5 +1,10 @@
+from functools import lru_cache
+
 import cv2
-import numpy as np
+
+from kolam_geometry import lsystem_geometry
+from lsystem import expand_lsystem_string
+from point_overlay import KolamOverlay
 
 # L-System parameters
 axiom = "FBFBFBFB"  # Initiator
@@ -9,63 +14,32 @@ rules = {
 }
 angle = 45  # Angle in degrees
 
-# Function to expand the L-System string
-def expand_lsystem_string(axiom, rules, iterations):
-    result = axiom
-    for _ in range(iterations):
-        result = "".join([rules.get(ch, ch) for ch in result])
-    return result
-
-# Function to interpret the L-System string and draw the Suli Kolam pattern
-def draw_suli_kolam(lsystem_string, dot_size, img):
-    # Interpret the L-System string
-    for symbol in lsystem_string:
-        if symbol == "F+A":
-            draw_line(dot_size, img)
-        elif symbol == "A":
-            draw_arc(dot_size, 90, img)
-        elif symbol == "B":
-            forward_units = 5 / (2 ** 0.5)
-            draw_line(forward_units, img)
-            draw_arc(forward_units, 270, img)
-            cv2.circle(img, (int(x), int(y)), dot_size // 2, (0, 0, 0), -1)
-
-# Function to draw a line segment
-def draw_line(length, img):
-    global x, y
-    x2 = x + length * np.cos(np.radians(angle))
-    y2 = y - length * np.sin(np.radians(angle))
-    cv2.line(img, (int(x), int(y)), (int(x2), int(y2)), (0, 0, 0), thickness=dot_size)
-    x, y = x2, y2
-
-# Function to draw an arc
-def draw_arc(radius, angle, img):
-    global x, y
-    x2 = x + radius * np.cos(np.radians(angle + 90))
-    y2 = y - radius * np.sin(np.radians(angle + 90))
-    cv2.ellipse(img, (int(x), int(y)), (int(radius), int(radius)), angle, 0, 90, (0, 0, 0), thickness=dot_size)
-    x, y = x2, y2
+# Suli Kolam pattern for a dot size and iteration count as a cached overlay.
+# The L-System is expanded and turned into geometry only when these change; the
+# overlay draws itself once per frame size and is then pasted onto each frame.
+@lru_cache(maxsize=8)
+def suli_kolam_overlay(dot_size, iterations):
+    lsystem_string = expand_lsystem_string(axiom, rules, iterations)
+    geom = lsystem_geometry(lsystem_string, dot_size)
+    # The loops round the dots have a fixed radius of 5 / sqrt(2), so the
+    # stroke and dots stay one pixel whatever the dot size
+    return KolamOverlay(geom, thickness=1, dot_radius=1)
 
 # Set the dot size and number of iterations
 dot_size = 10
 iterations = 2
 
-# Expand the L-System string
-lsystem_string = expand_lsystem_string(axiom, rules, iterations)
-
 # Initialize video capture
 video_capture = cv2.VideoCapture(0)
 
 while True:
     # Read a frame from the video stream
     ret, frame = video_capture.read()
+    if not ret:
+        break
 
-    # Initialize the starting position for drawing the Suli Kolam pattern
-    x, y = frame.shape[1] // 2, frame.shape[0] // 2
-    angle = 0
-
-    # Draw the Suli Kolam pattern on the current frame
-    draw_suli_kolam(lsystem_string, dot_size, frame)
+    # Draw the Suli Kolam pattern on the current frame, starting at its centre
+    suli_kolam_overlay(dot_size, iterations).composite(frame)
 
     # Display the frame
     cv2.imshow('Live Video', frame)
@@ -0,0 +1,318 @@
+import numpy as np
+
+# Pulli (dot) grid detection for photos of kolams.
+#
+# Dots are found as blobs with a scale-normalized determinant-of-Hessian
+# detector: the kolam's lines are ridges, where the determinant stays near
+# zero, while a filled dot answers strongly at the scale matching its radius.
+# The Gaussian derivatives for every scale come from one FFT of the image, and
+# images too big for one pass are cut into overlapping tiles that can be
+# mapped over an executor.
+#
+# The lattice is then fitted with RANSAC: candidate basis vectors are drawn from
+# nearest-neighbour offsets (found through a spatial hash, so the search is
+# linear in the number of dots), every hypothesis is scored against all dots
+# in one vectorized pass, and the best one is refined by least squares.
+
+# Longest side of the image dot detection works on
+DOT_WORK_SIZE = 768
+
+# Dot radii (work image pixels) the detector looks for
+DOT_RADII = (1.5, 2.5, 4.0, 6.0, 9.0)
+
+# Blob response needed to count as a dot, relative to an ideal full-contrast dot
+DOT_THRESHOLD = 0.3
+
+# Most ink allowed anywhere on the ring just outside a dot, relative to its
+# centre; blobs on lines, line ends and crossings touch ink there
+MAX_RING_INK = 0.35
+
+# Tiles used when the work image is larger than this on either side; smaller
+# than DOT_WORK_SIZE, so full-size work images are always detected in tiles
+DOT_TILE_SIZE = 512
+DOT_TILE_OVERLAP = 32
+
+# RANSAC settings; a dot is a lattice inlier if it lies within
+# LATTICE_TOLERANCE of the grid spacing from a lattice point
+RANSAC_ITERATIONS = 200
+LATTICE_TOLERANCE = 0.2
+NEIGHBOURS = 4
+
+# Scale-normalized determinant-of-Hessian peak of a unit-contrast disc of
+# radius sqrt(2) * sigma; responses are reported relative to this
+_IDEAL_DISC_RESPONSE = 0.135
+
+
+# Ink map in [0, 1]: distance from the background level, so dark-on-light and
+# light-on-dark photos look the same
+def ink_map(pixels):
+    ink = np.abs(pixels - np.median(pixels))
+    scale = np.percentile(ink, 99.5)
+    if scale <= 0:
+        return np.zeros_like(pixels, dtype=np.float32)
+    return np.clip(ink / scale, 0, 1).astype(np.float32)
+
+
+# Smallest 2^a 3^b 5^c at least n; pocketfft is several times slower on
+# lengths with large prime factors
+def _fft_size(n):
+    best = 2 * n
+    p2 = 1
+    while p2 < best:
+        p3 = p2
+        while p3 < best:
+            p5 = p3
+            while p5 < n:
+                p5 *= 5
+            best = min(best, p5)
+            p3 *= 3
+        p2 *= 2
+    return best
+
+
+def _ring_sample(ink, xs, ys, radii, samples=16):
+    h, w = ink.shape
+    angles = np.arange(samples) * (2 * np.pi / samples)
+    rx = np.clip(np.rint(xs[:, None] + radii[:, None] * np.cos(angles)), 0, w - 1).astype(np.intp)
+    ry = np.clip(np.rint(ys[:, None] + radii[:, None] * np.sin(angles)), 0, h - 1).astype(np.intp)
+    return ink[ry, rx].max(axis=1)
+
+
+# Dots in an ink map as an (n, 3) array of x, y, radius
+def detect_dots(ink, radii=DOT_RADII, threshold=DOT_THRESHOLD):
+    h, w = ink.shape
+    # Zero padding keeps the blur from wrapping around the edges
+    pad = int(np.ceil(3 * max(radii)))
+    shape = (_fft_size(h + pad), _fft_size(w + pad))
+    spectrum = np.fft.rfft2(ink.astype(np.float32), s=shape)
+    # Single precision throughout; float64 buys nothing at this noise level
+    ky = (2 * np.pi * np.fft.fftfreq(shape[0])[:, None]).astype(np.float32)
+    kx = (2 * np.pi * np.fft.rfftfreq(shape[1])[None, :]).astype(np.float32)
+    k2 = kx * kx + ky * ky
+
+    best = np.zeros((h, w), dtype=np.float32)
+    best_radius = np.zeros((h, w), dtype=np.float32)
+    for radius in radii:
+        sigma = np.float32(radius / np.sqrt(2))
+        smoothed = spectrum * np.exp(-0.5 * sigma * sigma * k2)
+        lxx = np.fft.irfft2(smoothed * -(kx * kx), s=shape)[:h, :w]
+        lyy = np.fft.irfft2(smoothed * -(ky * ky), s=shape)[:h, :w]
+        lxy = np.fft.irfft2(smoothed * -(kx * ky), s=shape)[:h, :w]
+        # Bright blobs have both curvatures negative; saddles and ridges do not
+        response = sigma ** 4 * (lxx * lyy - lxy * lxy) * (lxx < 0)
+        better = response > best
+        best[better] = response[better]
+        best_radius[better] = radius
+
+    best /= _IDEAL_DISC_RESPONSE
+    # Local maxima over the 3x3 neighbourhood. Ties with the neighbours before
+    # a pixel (in row-major order) go to those neighbours, so a flat peak, as
+    # left by a dot centred between pixels, gives one dot and not several.
+    padded = np.pad(best, 1)
+    peaks = best >= threshold
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            if (dy, dx) < (1, 1):
+                peaks &= best > padded[dy:dy + h, dx:dx + w]
+            elif (dy, dx) > (1, 1):
+                peaks &= best >= padded[dy:dy + h, dx:dx + w]
+    ys, xs = np.nonzero(peaks)
+    if len(xs) == 0:
+        return np.zeros((0, 3), dtype=np.float64)
+
+    radius = best_radius[ys, xs]
+    centre_ink = ink[ys, xs]
+    ring_ink = _ring_sample(ink, xs, ys, 2 * radius + 1)
+    isolated = ring_ink <= MAX_RING_INK * np.maximum(centre_ink, 1e-6)
+    return np.column_stack([xs[isolated], ys[isolated], radius[isolated]]).astype(np.float64)
+
+
+def _detect_tile(args):
+    ink, x0, y0, core = args
+    dots = detect_dots(ink)
+    if len(dots):
+        # Keep only dots in this tile's own (non-overlap) region
+        cx0, cy0, cx1, cy1 = core
+        inside = (dots[:, 0] >= cx0) & (dots[:, 0] < cx1) & (dots[:, 1] >= cy0) & (dots[:, 1] < cy1)
+        dots = dots[inside]
+        dots[:, 0] += x0
+        dots[:, 1] += y0
+    return dots
+
+
+# Dot detection over overlapping tiles. executor may be anything with a
+# map() (a ProcessPoolExecutor to spread big images across cores); tiles run
+# one after another when it is None.
+def detect_dots_tiled(ink, tile=DOT_TILE_SIZE, overlap=DOT_TILE_OVERLAP, executor=None):
+    h, w = ink.shape
+    if h <= tile and w <= tile:
+        return detect_dots(ink)
+
+    jobs = []
+    for y in range(0, h, tile):
+        for x in range(0, w, tile):
+            x0, y0 = max(x - overlap, 0), max(y - overlap, 0)
+            x1, y1 = min(x + tile + overlap, w), min(y + tile + overlap, h)
+            core = (x - x0, y - y0, min(x + tile, w) - x0, min(y + tile, h) - y0)
+            jobs.append((ink[y0:y1, x0:x1], x0, y0, core))
+    results = list((executor.map if executor is not None else map)(_detect_tile, jobs))
+    return np.concatenate(results) if results else np.zeros((0, 3), dtype=np.float64)
+
+
+# Offsets from each dot to its k nearest neighbours, found through a spatial
+# hash with cells about one dot spacing wide
+def neighbour_vectors(points, k=NEIGHBOURS, per_cell=6):
+    n = len(points)
+    if n < 2:
+        return np.zeros((0, 2))
+    span = points.max(axis=0) - points.min(axis=0)
+    cell = 1.5 * np.sqrt(max(span[0] * span[1], 1.0) / n)
+    if span[0] == 0 or span[1] == 0:
+        cell = 1.5 * max(span.max(), 1.0) / n
+
+    cells = np.floor((points - points.min(axis=0)) / cell).astype(np.int64)
+    n_cols = int(cells[:, 0].max()) + 3
+    keys = (cells[:, 1] + 1) * n_cols + cells[:, 0] + 1
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    candidates = []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            neighbour_keys = keys + dy * n_cols + dx
+            start = np.searchsorted(sorted_keys, neighbour_keys, side="left")
+            end = np.searchsorted(sorted_keys, neighbour_keys, side="right")
+            for slot in range(per_cell):
+                index = start + slot
+                valid = index < end
+                candidates.append(np.where(valid, order[np.minimum(index, n - 1)], -1))
+    candidates = np.stack(candidates, axis=1)
+
+    valid = (candidates >= 0) & (candidates != np.arange(n)[:, None])
+    offsets = points[np.maximum(candidates, 0)] - points[:, None, :]
+    distances = np.where(valid, np.hypot(offsets[..., 0], offsets[..., 1]), np.inf)
+    k = min(k, distances.shape[1])
+    nearest = np.argsort(distances, axis=1)[:, :k]
+    rows = np.arange(n)[:, None]
+    keep = np.isfinite(distances[rows, nearest])
+    return offsets[rows, nearest][keep]
+
+
+# Shortest basis of the lattice spanned by a and b (Lagrange-Gauss
+# reduction), turned so the angle between the vectors is at most 90 degrees
+def _reduce_basis(a, b):
+    for _ in range(32):
+        if a @ a > b @ b:
+            a, b = b, a
+        m = np.round((a @ b) / (a @ a))
+        if m == 0:
+            break
+        b = b - m * a
+    if a @ b < 0:
+        b = -b
+    return a, b
+
+
+def _lattice_inliers(points, origin, basis, tolerance):
+    coords = np.linalg.solve(basis.T, (points - origin).T).T
+    integer = np.round(coords)
+    residual = (coords - integer) @ basis
+    spacing = np.sqrt(min(basis[0] @ basis[0], basis[1] @ basis[1]))
+    return np.hypot(residual[:, 0], residual[:, 1]) <= tolerance * spacing, integer
+
+
+# Fits a 2D lattice to dot centres. Returns None when there are too few dots
+# to fit, else a dict with origin, basis (2x2, rows are the lattice vectors),
+# integer lattice coordinates and the inlier mask.
+def fit_lattice(points, iterations=RANSAC_ITERATIONS, tolerance=LATTICE_TOLERANCE, seed=0):
+    if len(points) < 3:
+        return None
+    vectors = neighbour_vectors(points)
+    lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+    vectors = vectors[lengths > 0]
+    if len(vectors) < 2:
+        return None
+
+    rng = np.random.default_rng(seed)
+    best = None
+    for _ in range(iterations):
+        a, b = vectors[rng.integers(len(vectors), size=2)]
+        cross = a[0] * b[1] - a[1] * b[0]
+        if abs(cross) < 0.25 * np.hypot(*a) * np.hypot(*b):
+            continue
+        a, b = _reduce_basis(a, b)
+        basis = np.array([a, b])
+        origin = points[rng.integers(len(points))]
+        inliers, _ = _lattice_inliers(points, origin, basis, tolerance)
+        count = int(inliers.sum())
+        if best is None or count > best[0]:
+            best = (count, origin, basis)
+    if best is None:
+        return None
+
+    # Least-squares refinement of origin and basis over the inliers
+    _, origin, basis = best
+    inliers, integer = _lattice_inliers(points, origin, basis, tolerance)
+    design = np.column_stack([np.ones(int(inliers.sum())), integer[inliers]])
+    solution, *_ = np.linalg.lstsq(design, points[inliers], rcond=None)
+    origin, basis = solution[0], solution[1:]
+    # Put the more horizontal vector first, pointing right, so columns run
+    # along x
+    if abs(basis[1, 0]) > abs(basis[0, 0]):
+        basis = basis[::-1]
+    if basis[0, 0] < 0:
+        basis[0] = -basis[0]
+    if basis[1, 1] < 0:
+        basis[1] = -basis[1]
+    inliers, integer = _lattice_inliers(points, origin, basis, tolerance)
+    integer = integer - integer[inliers].min(axis=0)
+    return {"origin": origin, "basis": basis, "coords": integer.astype(np.int64), "inliers": inliers}
+
+
+# Square or rhombus, the grid's rows x columns and its spacing, from a fitted
+# lattice. scale converts work image pixels to original image pixels.
+def describe_lattice(lattice, scale=1.0):
+    a, b = lattice["basis"]
+    length_a, length_b = np.hypot(*a), np.hypot(*b)
+    angle = np.degrees(np.arccos(np.clip(a @ b / (length_a * length_b), -1, 1)))
+    # Two detections on one lattice point are one dot, so the count never
+    # exceeds rows x columns
+    coords = np.unique(lattice["coords"][lattice["inliers"]], axis=0)
+    columns, rows = (coords.max(axis=0) + 1).tolist()
+    dot_count = int(len(coords))
+
+    grid_type = "square" if abs(angle - 90) <= 10 and abs(length_a - length_b) <= 0.15 * max(length_a, length_b) else "rhombus"
+    return {
+        "type": grid_type,
+        "rows": int(rows),
+        "columns": int(columns),
+        "dotCount": dot_count,
+        "spacing": round(float((length_a + length_b) / 2 * scale), 1),
+        "angle": round(float(angle), 1),
+        "rotation": round(float(np.degrees(np.arctan2(a[1], a[0]))), 1) + 0.0,
+        # Dots laid out in a diamond (1-3-5-3-1 and the like) fill about half
+        # of their bounding grid
+        "diamond": dot_count <= 0.6 * rows * columns,
+    }
+
+
+# Detects the dot grid in grayscale pixels. Returns None when no lattice of at
+# least min_dots dots is found.
+def analyze_dot_grid(pixels, scale=1.0, executor=None, min_dots=4):
+    dots = detect_dots_tiled(ink_map(pixels), executor=executor)
+    lattice = fit_lattice(dots[:, :2])
+    if lattice is None or lattice["inliers"].sum() < min_dots:
+        return None
+    grid = describe_lattice(lattice, scale)
+    grid["dotRadius"] = round(float(np.median(dots[lattice["inliers"], 2]) * scale), 1)
+    return grid
+
+
+# gridSystem text as shown by the analyze page
+def describe_grid(grid):
+    if grid is None:
+        return "No Dot Grid Detected"
+    name = f"{grid['type'].capitalize()} Grid ({grid['rows']}x{grid['columns']})"
+    if grid["diamond"]:
+        name += ", Diamond Layout"
+    return name
@@ -1,11 +1,33 @@
-from fastapi import FastAPI
-from fastapi.responses import Response
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from contextlib import asynccontextmanager
+import asyncio
 import svgwrite
+import numpy as np
 import math
-
-app = FastAPI()
+import os
+from lsystem import expand_lsystem_string, lsystem_length, max_iterations_within
+from kolam_geometry import geometry_to_svg_path
+from lsystem_tables import get_transform_tables
+from generation_pool import GenerationPool, PoolBusyError
+from svg_stream import iter_lsystem_svg
+from svg_path import format_number
+from kolam_analysis import ImageDecodeError, analyze_kolam_image_data, decode_base64_image, rescale_analysis
+from image_cache import PerceptualCache, image_fingerprint
+from image_vectorize import vectorize_image
+from image_upload import UploadTooLargeError, read_image_upload, read_limited_body
+from response_cache import ResponseCache, canonical_key, etag_for_key, etag_matches
+
+# Start the generation worker pool with the app and stop it on shutdown
+@asynccontextmanager
+async def lifespan(app):
+    generation_pool.start(warmup=warm_up_worker)
+    yield
+    generation_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -14,6 +36,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing"],
 )
 
 class KolamParameters(BaseModel):
@@ -29,19 +52,96 @@ class KolamParameters(BaseModel):
     polygon1_radius: int = 3 # New parameter for Group Theory Kolam
     polygon2_sides: int = 8 # New parameter for Group Theory Kolam
     polygon2_radius: int = 2 # New parameter for Group Theory Kolam
+    compact_path: bool = True # Emit L-System kolams as one <path>, and Group Theory cells as <use> of shared polygons
+    precision: int = 2 # Decimal places for coordinates in compact paths
+    stream: bool = False # Stream L-System kolams as they are generated instead of building the SVG in memory
 
 class ImageProcessRequest(BaseModel):
     image: str # Base64 encoded image string
 
-# Function to expand the L-System string (from kolampython.py)
-def expand_lsystem_string(axiom, rules, iterations):
-    result = axiom
-    for _ in range(iterations):
-        result = "".join([rules.get(ch, ch) for ch in result])
-    return result
+# Largest image upload accepted, in bytes (base64 JSON bodies may be a third
+# bigger to allow for the encoding)
+MAX_UPLOAD_BYTES = int(os.environ.get("KOLAM_MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+
+# Request bodies the image endpoints accept, for the OpenAPI docs
+IMAGE_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": ImageProcessRequest.model_json_schema()},
+            "multipart/form-data": {"schema": {"type": "object", "properties": {"image": {"type": "string", "format": "binary"}}}},
+            "image/*": {"schema": {"type": "string", "format": "binary"}},
+        },
+    },
+}
+
+# Largest L-System string the API will expand for one request
+MAX_LSYSTEM_SYMBOLS = int(os.environ.get("KOLAM_MAX_LSYSTEM_SYMBOLS", 1_000_000))
+# Streamed responses never hold the whole string or SVG, so they may go bigger.
+# Streaming runs at about 3.7 us and 17 bytes per symbol: 9 iterations of the
+# default rules (2.8M symbols) take 10 s and 49 MB.
+MAX_STREAM_LSYSTEM_SYMBOLS = int(os.environ.get("KOLAM_MAX_STREAM_LSYSTEM_SYMBOLS", 4_000_000))
+# Wall-clock limit on a streamed response, in seconds
+STREAM_TIMEOUT = float(os.environ.get("KOLAM_STREAM_TIMEOUT", 60))
+# Most L-System iterations accepted; the size check steps through them one by
+# one while the string still grows
+MAX_LSYSTEM_ITERATIONS = int(os.environ.get("KOLAM_MAX_LSYSTEM_ITERATIONS", 10_000))
+LSYSTEM_DESIGN_TYPES = ("lsystem", "suzhi", "kambi")
+
+# Parameters that affect the output of each design type. Only these go into the
+# cache key, so tweaking an unrelated slider still hits the cache.
+LSYSTEM_CACHE_FIELDS = ("axiom", "rules", "dot_size", "iterations", "compact_path", "precision")
+DESIGN_CACHE_FIELDS = {
+    "lsystem": LSYSTEM_CACHE_FIELDS,
+    "suzhi": LSYSTEM_CACHE_FIELDS,
+    "kambi": LSYSTEM_CACHE_FIELDS + ("rhombus_size",),
+    "grouptheory": ("grid_size", "polygon1_sides", "polygon1_radius", "polygon2_sides", "polygon2_radius", "compact_path", "precision"),
+}
+# Bump whenever the generators change their output, so old cache entries and
+# ETags are not served for the new rendering
+RENDER_VERSION = "2"
+
+# Rendered SVGs keyed by the canonical hash of their parameters
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get("KOLAM_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    disk_dir=os.environ.get("KOLAM_CACHE_DIR") or None,
+    max_disk_bytes=int(os.environ.get("KOLAM_CACHE_MAX_DISK_BYTES", 512 * 1024 * 1024)),
+)
+
+# Image analysis and vectorization results keyed by perceptual hashes of the
+# upload, so re-uploads of the same photo (recompressed, resized) are answered
+# without running the pipelines again
+image_result_cache = PerceptualCache(
+    max_entries=int(os.environ.get("KOLAM_IMAGE_CACHE_ENTRIES", 256)),
+    tolerance=int(os.environ.get("KOLAM_IMAGE_HASH_TOLERANCE", 8)),
+)
+
+# CPU-bound rendering runs in worker processes so one big kolam cannot stall
+# the event loop. Jobs cheaper than KOLAM_INLINE_COST primitives are rendered
+# in a thread since sending them to a worker costs more than drawing them.
+generation_pool = GenerationPool(
+    max_workers=int(os.environ.get("KOLAM_WORKERS", 0)) or None,
+    max_pending=int(os.environ.get("KOLAM_MAX_PENDING", 0)) or None,
+    timeout=float(os.environ.get("KOLAM_RENDER_TIMEOUT", 30)),
+    inline_cost=int(os.environ.get("KOLAM_INLINE_COST", 5000)),
+)
 
-def generate_lsystem_kolam_svg(params: KolamParameters):
-    dwg = svgwrite.Drawing('kolam.svg', profile='tiny', size=('600px', '600px'))
+def kolam_cache_key(params: KolamParameters):
+    fields = DESIGN_CACHE_FIELDS[params.design_type]
+    data = params.model_dump(include=set(fields))
+    data["design_type"] = params.design_type
+    return canonical_key(data, version=RENDER_VERSION)
+
+# Draws the whole L-System as a single compact <path> element. Geometry is
+# stamped from the memoized per-symbol tables, so the string is never expanded.
+def add_compact_lsystem_path(dwg, params: KolamParameters, start_x, start_y):
+    tables = get_transform_tables(params.rules, params.dot_size)
+    geom = tables.geometry(params.axiom, params.iterations, start_x, start_y)
+    dwg.add(dwg.path(d=geometry_to_svg_path(geom, params.precision), stroke='black', stroke_width=2, fill='none'))
+
+def generate_lsystem_kolam_svg(params: KolamParameters, lsystem_string=None):
+    # Skip svgwrite's validator in compact mode: it re-parses the whole path string with a regex
+    dwg = svgwrite.Drawing('kolam.svg', profile='tiny', size=('600px', '600px'), debug=not params.compact_path)
     dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='white'))
 
     current_x, current_y = 300, 300
@@ -85,11 +185,16 @@ def generate_lsystem_kolam_svg(params: KolamParameters):
         current_x, current_y = end_x, end_y
         current_angle += angle_degrees
 
-    lsystem_string = expand_lsystem_string(params.axiom, params.rules, params.iterations)
-
     current_x = 300 - params.dot_size
     current_y = 300 + params.dot_size
 
+    if params.compact_path:
+        add_compact_lsystem_path(dwg, params, current_x, current_y)
+        return dwg.tostring()
+
+    if lsystem_string is None:
+        lsystem_string = expand_lsystem_string(params.axiom, params.rules, params.iterations)
+
     for symbol in lsystem_string:
         if symbol == "F":
             draw_line_svg(params.dot_size)
@@ -102,8 +207,9 @@ def generate_lsystem_kolam_svg(params: KolamParameters):
 
     return dwg.tostring()
 
-def generate_suzhi_kolam_svg(params: KolamParameters):
-    dwg = svgwrite.Drawing('suzhi_kolam.svg', profile='tiny', size=('600px', '600px'))
+def generate_suzhi_kolam_svg(params: KolamParameters, lsystem_string=None):
+    # Skip svgwrite's validator in compact mode: it re-parses the whole path string with a regex
+    dwg = svgwrite.Drawing('suzhi_kolam.svg', profile='tiny', size=('600px', '600px'), debug=not params.compact_path)
     dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='white'))
 
     current_x, current_y = 300, 300
@@ -147,11 +253,16 @@ def generate_suzhi_kolam_svg(params: KolamParameters):
         current_x, current_y = end_x, end_y
         current_angle += angle_degrees
 
-    lsystem_string = expand_lsystem_string(params.axiom, params.rules, params.iterations)
-
     current_x = 300 - params.dot_size
     current_y = 300 + params.dot_size
 
+    if params.compact_path:
+        add_compact_lsystem_path(dwg, params, current_x, current_y)
+        return dwg.tostring()
+
+    if lsystem_string is None:
+        lsystem_string = expand_lsystem_string(params.axiom, params.rules, params.iterations)
+
     for symbol in lsystem_string:
         if symbol == "F":
             draw_line_svg(params.dot_size)
@@ -164,8 +275,9 @@ def generate_suzhi_kolam_svg(params: KolamParameters):
 
     return dwg.tostring()
 
-def generate_kambi_kolam_svg(params: KolamParameters):
-    dwg = svgwrite.Drawing('kambi_kolam.svg', profile='tiny', size=('600px', '600px'))
+def generate_kambi_kolam_svg(params: KolamParameters, lsystem_string=None):
+    # Skip svgwrite's validator in compact mode: it re-parses the whole path string with a regex
+    dwg = svgwrite.Drawing('kambi_kolam.svg', profile='tiny', size=('600px', '600px'), debug=not params.compact_path)
     dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='white'))
 
     current_x, current_y = 300, 300
@@ -216,7 +328,12 @@ def generate_kambi_kolam_svg(params: KolamParameters):
         current_x, current_y = end_x, end_y
         current_angle += angle_degrees
 
-    lsystem_string = expand_lsystem_string(params.axiom, params.rules, params.iterations)
+    if params.compact_path:
+        add_compact_lsystem_path(dwg, params, current_x, current_y)
+        return dwg.tostring()
+
+    if lsystem_string is None:
+        lsystem_string = expand_lsystem_string(params.axiom, params.rules, params.iterations)
 
     for symbol in lsystem_string:
         if symbol == "F":
@@ -241,7 +358,58 @@ def create_polygon_svg(center, sides, radius, dwg, offset_x, offset_y):
     points_str = " ".join([f"{p[0]},{p[1]}" for p in points])
     dwg.add(dwg.polygon(points=points, stroke='black', fill='none', stroke_width=2))
 
+GROUPTHEORY_SVG_HEADER = (
+    '<svg baseProfile="tiny" height="800px" version="1.2" width="800px" '
+    'xmlns="http://www.w3.org/2000/svg" xmlns:ev="http://www.w3.org/2001/xml-events" '
+    'xmlns:xlink="http://www.w3.org/1999/xlink">'
+)
+
+# Group Theory kolam with each polygon shape written once in <defs> and every
+# grid cell placed with a <use>. Cell offsets come from a NumPy meshgrid, so
+# large grids stay fast and the SVG stays small.
+def generate_grouptheory_kolam_svg_compact(params: KolamParameters):
+    center_x, center_y = 400, 400 # Center of the 800x800 canvas
+    scale_factor = 40 # Corresponds to the 40 used in the python turtle example
+
+    def polygon_points(sides, radius):
+        if sides < 1:
+            return ""
+        angles = np.arange(sides) * (2 * np.pi / sides)
+        xs = np.round(radius * np.cos(angles) * scale_factor / 3, params.precision).tolist()
+        ys = np.round(radius * np.sin(angles) * scale_factor / 3, params.precision).tolist()
+        return " ".join(f"{format_number(x)},{format_number(y)}" for x, y in zip(xs, ys))
+
+    polygons = [
+        polygon_points(params.polygon1_sides, params.polygon1_radius),
+        polygon_points(params.polygon2_sides, params.polygon2_radius),
+    ]
+
+    parts = [GROUPTHEORY_SVG_HEADER, "<defs>"]
+    for i, points in enumerate(polygons):
+        if points:
+            parts.append(f'<polygon fill="none" id="p{i + 1}" points="{points}" stroke="black" stroke-width="1" />')
+    parts.append('</defs><rect fill="white" height="100%" width="100%" x="0" y="0" />')
+
+    grid_offset_x = center_x - (params.grid_size - 1) * scale_factor / 2
+    grid_offset_y = center_y - (params.grid_size - 1) * scale_factor / 2
+    rows, cols = np.meshgrid(np.arange(params.grid_size), np.arange(params.grid_size), indexing="ij")
+    offsets_x = np.round(grid_offset_x + cols.ravel() * scale_factor, params.precision).tolist()
+    offsets_y = np.round(grid_offset_y + rows.ravel() * scale_factor, params.precision).tolist()
+    # Polygon 1 on cells where row + column is even, polygon 2 elsewhere
+    shapes = ((rows + cols).ravel() % 2).tolist()
+
+    parts.extend(
+        f'<use x="{format_number(x)}" xlink:href="#p{shape + 1}" y="{format_number(y)}" />'
+        for x, y, shape in zip(offsets_x, offsets_y, shapes)
+        if polygons[shape]
+    )
+    parts.append("</svg>")
+    return "".join(parts)
+
 def generate_grouptheory_kolam_svg(params: KolamParameters):
+    if params.compact_path:
+        return generate_grouptheory_kolam_svg_compact(params)
+
     dwg = svgwrite.Drawing('grouptheory_kolam.svg', profile='tiny', size=('800px', '800px'))
     dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='white'))
 
@@ -281,22 +449,43 @@ def generate_grouptheory_kolam_svg(params: KolamParameters):
 
     return dwg.tostring()
 
-@app.post("/generate-from-image")
-async def generate_kolam_from_image(request: ImageProcessRequest):
+# Raw image bytes from a JSON ({"image": base64}), multipart/form-data or raw
+# image/* request body
+async def read_image_request(request: Request):
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        body = await read_limited_body(request, MAX_UPLOAD_BYTES * 4 // 3 + 1024)
+        try:
+            image = ImageProcessRequest.model_validate_json(body).image
+        except ValidationError as e:
+            raise ImageDecodeError(f"Invalid JSON image request: {e.errors()[0]['msg']}")
+        return await asyncio.to_thread(decode_base64_image, image)
+    return await read_image_upload(request, MAX_UPLOAD_BYTES)
+
+@app.post("/generate-from-image", openapi_extra=IMAGE_UPLOAD_OPENAPI)
+async def generate_kolam_from_image(request: Request):
     try:
-        # Here you would add your image processing logic
-        # For now, let's return a simple static SVG or an error indicating it's not implemented
-        # In a real scenario, you'd decode the base64 image, process it, and generate a kolam SVG
-
-        # Placeholder: return a simple SVG
-        svg_data = """
-<svg width="200" height="200" viewBox="0 0 200 200" xmlns="http://www.w3.org/2000/svg">
-  <rect x="0" y="0" width="200" height="200" fill="#f0f0f0"/>
-  <circle cx="100" cy="100" r="80" stroke="#333" stroke-width="2" fill="none"/>
-  <text x="50%" y="50%" font-family="sans-serif" font-size="16" fill="#333" text-anchor="middle" alignment-baseline="middle">Generated from Image (Placeholder)</text>
-</svg>
-        """
-        return Response(content=svg_data, media_type="image/svg+xml")
+        # The whole pipeline is one generation pool job, so it counts against
+        # the admission limit and a timeout stops it; big masks are thinned
+        # tile by tile inside the worker
+        try:
+            image = await read_image_request(request)
+            hashes, _, _ = await asyncio.to_thread(image_fingerprint, image)
+            svg_data = image_result_cache.get("vectorize", hashes)
+            if svg_data is not None:
+                return Response(content=svg_data, media_type="image/svg+xml", headers={"Server-Timing": 'cache;desc="hit"'})
+            svg_data, timings = await generation_pool.run(vectorize_image, image)
+            image_result_cache.put("vectorize", hashes, svg_data)
+        except UploadTooLargeError as e:
+            return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: {e}</text></svg>", media_type="image/svg+xml", status_code=413)
+        except ImageDecodeError as e:
+            return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: {e}</text></svg>", media_type="image/svg+xml", status_code=400)
+        except PoolBusyError as e:
+            return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: Server busy, {e}</text></svg>", media_type="image/svg+xml", status_code=503, headers={"Retry-After": "1"})
+        except asyncio.TimeoutError:
+            return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: Image conversion timed out after {generation_pool.timeout} seconds</text></svg>", media_type="image/svg+xml", status_code=504)
+        server_timing = ", ".join(f"{name};dur={duration}" for name, duration in timings.items())
+        return Response(content=svg_data, media_type="image/svg+xml", headers={"Server-Timing": server_timing})
     except Exception as e:
         import traceback
         return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: {e}\n{traceback.format_exc()}</text></svg>", media_type="image/svg+xml", status_code=500)
@@ -310,34 +499,62 @@ async def options_generate_kolam_from_image():
         "Access-Control-Max-Age": "86400" # Cache preflight response for 24 hours
     })
 
-@app.post("/analyze-kolam-image")
-async def analyze_kolam_image(request: ImageProcessRequest):
+@app.post("/analyze-kolam-image", openapi_extra=IMAGE_UPLOAD_OPENAPI)
+async def analyze_kolam_image(request: Request):
     try:
-        # Here you would integrate your actual image analysis logic.
-        # For now, return mock analysis results.
-        mock_analysis_result = {
-            "symmetryType": "4-fold Rotational Symmetry",
-            "rotationPatterns": ["90° rotation", "180° rotation", "270° rotation", "360° rotation"],
-            "gridSystem": "Square Grid (8x8)",
+        try:
+            image = await read_image_request(request)
+            hashes, size, extent = await asyncio.to_thread(image_fingerprint, image)
+            cached = image_result_cache.get("analysis", hashes)
+            if cached is None:
+                analysis = await generation_pool.run(analyze_kolam_image_data, image)
+                image_result_cache.put("analysis", hashes, (analysis, extent))
+            else:
+                # Stored for an upload that may have a different size; scale
+                # the pixel measurements by how big the ink is in this one
+                analysis, cached_extent = cached
+                analysis = rescale_analysis(analysis, extent / cached_extent, size)
+        except UploadTooLargeError as e:
+            return JSONResponse({"error": str(e)}, status_code=413)
+        except ImageDecodeError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        except PoolBusyError as e:
+            return JSONResponse({"error": f"Server busy, {e}"}, status_code=503, headers={"Retry-After": "1"})
+        except asyncio.TimeoutError:
+            return JSONResponse({"error": f"Image analysis timed out after {generation_pool.timeout} seconds"}, status_code=504)
+
+        # Symmetry, the dot grid and the line measurements come from the image;
+        # complexity and the algorithm text are still illustrative
+        grid = analysis["dotGrid"]
+        if grid is not None:
+            grid_step = f"1. Establish {grid['rows']}x{grid['columns']} dot grid with {grid['spacing']:g}px spacing"
+        else:
+            grid_step = "1. Establish the dot grid"
+        analysis_result = {
+            "symmetryType": analysis["symmetryType"],
+            "rotationPatterns": analysis["rotationPatterns"],
+            "symmetry": analysis["symmetry"],
+            "gridSystem": analysis["gridSystem"],
+            "dotGrid": grid,
             "complexity": "Intermediate",
             "specifications": {
-                "dimensions": "240 x 240 pixels",
-                "dotCount": 64,
-                "lineLength": "1,240 pixels total",
-                "strokeWidth": "2-3 pixels",
+                "dimensions": analysis["dimensions"],
+                "dotCount": grid["dotCount"] if grid is not None else 0,
+                "lineLength": f"{round(analysis['lineLength']):,} pixels total",
+                "strokeWidth": f"{analysis['strokeWidth']:g} pixels",
             },
             "algorithm": [
-                "1. Establish 8x8 dot grid with 30px spacing",
-                "2. Start from center point (4,4)",
+                grid_step,
+                "2. Start from the center point",
                 "3. Draw primary symmetry axes",
                 "4. Create connecting loops around dots",
-                "5. Apply 4-fold rotational symmetry",
+                f"5. Apply {analysis['symmetryType'].lower()}",
                 "6. Ensure continuous line path",
             ],
             "culturalSignificance":
                 "This pattern represents prosperity and protection, commonly drawn during festival seasons. The 4-fold symmetry symbolizes the four directions and cosmic balance.",
         }
-        return mock_analysis_result
+        return analysis_result
     except Exception as e:
         import traceback
         return Response(content=f"Error: {e}\n{traceback.format_exc()}", media_type="text/plain", status_code=500)
@@ -351,20 +568,105 @@ async def options_analyze_kolam_image():
         "Access-Control-Max-Age": "86400" # Cache preflight response for 24 hours
     })
 
+# Where the turtle starts for each L-System design type
+def lsystem_start_position(params: KolamParameters):
+    if params.design_type == "kambi":
+        rhombus_side = params.rhombus_size * params.dot_size
+        return 300 - rhombus_side / 2, 300 + rhombus_side / 2
+    return 300 - params.dot_size, 300 + params.dot_size
+
+# Rough rendering cost of a request, in primitives drawn; length is the
+# L-System string length, if already known
+def estimate_render_cost(params: KolamParameters, length=None):
+    if params.design_type in LSYSTEM_DESIGN_TYPES:
+        if length is None:
+            length = lsystem_length(params.axiom, params.rules, params.iterations)
+        return 2 * length
+    return params.grid_size * params.grid_size
+
+# Runs once in every worker process at startup
+def warm_up_worker():
+    render_kolam_svg(KolamParameters(iterations=1))
+
+def render_kolam_svg(params: KolamParameters, lsystem_string=None):
+    if params.design_type == "lsystem":
+        return generate_lsystem_kolam_svg(params, lsystem_string)
+    elif params.design_type == "suzhi":
+        return generate_suzhi_kolam_svg(params, lsystem_string)
+    elif params.design_type == "kambi":
+        return generate_kambi_kolam_svg(params, lsystem_string)
+    elif params.design_type == "grouptheory":
+        return generate_grouptheory_kolam_svg(params)
+    raise ValueError(f"Unknown design type {params.design_type}")
+
+# Renders several kolams that share (axiom, rules, iterations). The string is
+# expanded at most once for the whole group, and only if a member needs it
+# (compact paths are stamped from the transform tables instead).
+def render_kolam_group(params_list):
+    lsystem_string = None
+    results = []
+    for params in params_list:
+        if params.design_type in LSYSTEM_DESIGN_TYPES and not params.compact_path and lsystem_string is None:
+            lsystem_string = expand_lsystem_string(params.axiom, params.rules, params.iterations)
+        results.append(render_kolam_svg(params, lsystem_string))
+    return results
+
+# Returns (error, cost): error is (status_code, message) if the request cannot
+# be rendered, else None, and cost is its estimate_render_cost
+def validate_kolam_params(params: KolamParameters, max_symbols=MAX_LSYSTEM_SYMBOLS):
+    if params.design_type not in DESIGN_CACHE_FIELDS:
+        return (400, f"Unknown design type {params.design_type}"), None
+    if params.design_type not in LSYSTEM_DESIGN_TYPES:
+        return None, estimate_render_cost(params)
+    if params.iterations > MAX_LSYSTEM_ITERATIONS:
+        return (413, f"{params.iterations} iterations is over the limit of {MAX_LSYSTEM_ITERATIONS}"), None
+    # Check the final string length from the rules before expanding anything,
+    # giving up as soon as it is over the limit
+    length = lsystem_length(params.axiom, params.rules, params.iterations, limit=max_symbols)
+    if length > max_symbols:
+        max_iterations = max_iterations_within(params.axiom, params.rules, params.iterations, max_symbols)
+        return (413, f"{params.iterations} iterations would expand to more than {max_symbols} symbols; use at most {max_iterations} iterations"), None
+    return None, estimate_render_cost(params, length)
+
 @app.post("/generate-kolam-svg")
-async def generate_kolam_design(params: KolamParameters):
+async def generate_kolam_design(params: KolamParameters, request: Request):
     try:
-        if params.design_type == "lsystem":
-            svg_data = generate_lsystem_kolam_svg(params)
-        elif params.design_type == "suzhi":
-            svg_data = generate_suzhi_kolam_svg(params)
-        elif params.design_type == "kambi":
-            svg_data = generate_kambi_kolam_svg(params)
-        elif params.design_type == "grouptheory":
-            svg_data = generate_grouptheory_kolam_svg(params)
-        else:
-            return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: Unknown design type {params.design_type}</text></svg>", media_type="image/svg+xml", status_code=400)
-        return Response(content=svg_data, media_type="image/svg+xml")
+        streaming = params.stream and params.design_type in LSYSTEM_DESIGN_TYPES
+        error, cost = validate_kolam_params(params, MAX_STREAM_LSYSTEM_SYMBOLS if streaming else MAX_LSYSTEM_SYMBOLS)
+        if error is not None:
+            status_code, message = error
+            return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: {message}</text></svg>", media_type="image/svg+xml", status_code=status_code)
+
+        if streaming:
+            # Streamed straight from the lazy expander; Starlette iterates the
+            # generator in its thread pool, so the event loop stays free. The
+            # stream holds a generation pool slot for as long as it runs.
+            start_x, start_y = lsystem_start_position(params)
+            svg_chunks = iter_lsystem_svg(params.axiom, params.rules, params.iterations, params.dot_size,
+                                          start_x, start_y, params.precision)
+            try:
+                svg_chunks = generation_pool.stream(svg_chunks, timeout=STREAM_TIMEOUT)
+            except PoolBusyError as e:
+                return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: Server busy, {e}</text></svg>", media_type="image/svg+xml", status_code=503, headers={"Retry-After": "1"})
+            return StreamingResponse(svg_chunks, media_type="image/svg+xml")
+
+        # The key is derived from the parameters alone, so a matching ETag can be
+        # answered without touching the cache or the renderer
+        key = kolam_cache_key(params)
+        etag = etag_for_key(key)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        svg_data = await response_cache.get(key)
+        if svg_data is None:
+            try:
+                svg_data = await generation_pool.run(render_kolam_svg, params, cost=cost)
+            except PoolBusyError as e:
+                return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: Server busy, {e}</text></svg>", media_type="image/svg+xml", status_code=503, headers={"Retry-After": "1"})
+            except asyncio.TimeoutError:
+                return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: Kolam generation timed out after {generation_pool.timeout} seconds</text></svg>", media_type="image/svg+xml", status_code=504)
+            svg_data = await response_cache.put(key, svg_data)
+        return Response(content=svg_data, media_type="image/svg+xml", headers={"ETag": etag})
     except Exception as e:
         import traceback
         return Response(content=f"<svg><text x=\"10\" y=\"20\" fill=\"red\">Error: {e}\n{traceback.format_exc()}</text></svg>", media_type="image/svg+xml", status_code=500)
@@ -377,3 +679,74 @@ async def options_generate_kolam_design():
         "Access-Control-Allow-Headers": "Content-Type",
         "Access-Control-Max-Age": "86400" # Cache preflight response for 24 hours
     })
+
+# Most kolams accepted in one batch request
+MAX_BATCH_SIZE = int(os.environ.get("KOLAM_MAX_BATCH_SIZE", 64))
+
+# Groups batch members that can share one expanded string
+def batch_group_key(index, params: KolamParameters):
+    if params.design_type in LSYSTEM_DESIGN_TYPES:
+        return ("lsystem", params.axiom, tuple(sorted(params.rules.items())), params.iterations)
+    return (params.design_type, index)
+
+@app.post("/generate-kolam-svg/batch")
+async def generate_kolam_design_batch(params_list: list[KolamParameters]):
+    try:
+        if len(params_list) > MAX_BATCH_SIZE:
+            return JSONResponse({"error": f"Batch of {len(params_list)} kolams is over the limit of {MAX_BATCH_SIZE}"}, status_code=413)
+
+        results = [None] * len(params_list)
+        groups = {}
+        for index, params in enumerate(params_list):
+            error, cost = validate_kolam_params(params)
+            if error is not None:
+                results[index] = {"status": error[0], "error": error[1]}
+                continue
+            key = kolam_cache_key(params)
+            svg_data = await response_cache.get(key)
+            if svg_data is not None:
+                results[index] = {"status": 200, "etag": etag_for_key(key), "svg": svg_data.decode("utf-8")}
+                continue
+            groups.setdefault(batch_group_key(index, params), []).append((index, key, params, cost))
+
+        # One pool job per group; groups render in parallel across the workers,
+        # but no more at once than there are workers, so a big batch never
+        # takes enough admission slots to turn its own groups away
+        batch_slots = asyncio.Semaphore(generation_pool.max_workers)
+
+        async def render_group(members):
+            group_params = [params for _, _, params, _ in members]
+            cost = sum(cost for _, _, _, cost in members)
+            try:
+                async with batch_slots:
+                    svgs = await generation_pool.run(render_kolam_group, group_params, cost=cost)
+            except PoolBusyError as e:
+                for index, _, _, _ in members:
+                    results[index] = {"status": 503, "error": f"Server busy, {e}"}
+                return
+            except asyncio.TimeoutError:
+                for index, _, _, _ in members:
+                    results[index] = {"status": 504, "error": f"Kolam generation timed out after {generation_pool.timeout} seconds"}
+                return
+            except Exception as e:
+                for index, _, _, _ in members:
+                    results[index] = {"status": 500, "error": str(e)}
+                return
+            for (index, key, _, _), svg_data in zip(members, svgs):
+                await response_cache.put(key, svg_data)
+                results[index] = {"status": 200, "etag": etag_for_key(key), "svg": svg_data}
+
+        await asyncio.gather(*(render_group(members) for members in groups.values()))
+        return JSONResponse(results)
+    except Exception as e:
+        import traceback
+        return JSONResponse({"error": str(e), "traceback": traceback.format_exc()}, status_code=500)
+
+@app.options("/generate-kolam-svg/batch")
+async def options_generate_kolam_design_batch():
+    return Response(status_code=200, headers={
+        "Access-Control-Allow-Origin": "http://localhost:3000",
+        "Access-Control-Allow-Methods": "POST, OPTIONS",
+        "Access-Control-Allow-Headers": "Content-Type",
+        "Access-Control-Max-Age": "86400" # Cache preflight response for 24 hours
+    })
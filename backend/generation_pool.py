@@ -0,0 +1,266 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# Runs CPU-bound kolam generation off the asyncio event loop.
+#
+# Jobs go to a bounded process pool that is pre-warmed at startup. Each job
+# carries a cost estimate: cheap jobs run in a thread (shipping them to a
+# worker costs more than rendering), the rest are sent to the pool with a
+# timeout. Every job, including each item of map(), takes a slot; at most
+# max_pending slots may be taken, and past that callers get PoolBusyError
+# straight away instead of queueing without limit.
+#
+# A slot is only given back when its job has really finished. A job that runs
+# past the timeout cannot be cancelled once started, so the executor is
+# recycled: its worker processes are terminated and a fresh executor takes the
+# new jobs. Other jobs that were running on the old executor are resubmitted to
+# the new one within what is left of their own timeout. A worker that dies for
+# any other reason (killed for memory, a crash) breaks the executor the same
+# way, so it is recycled too and the job that saw it is run once more.
+#
+# Work that has to stay in this process, like a streamed response, can hold a
+# slot with stream() so it counts against the same limit.
+
+
+class PoolBusyError(Exception):
+    pass
+
+
+class GenerationPool:
+    def __init__(self, max_workers=None, max_pending=None, timeout=30.0, inline_cost=0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 4
+        self.timeout = timeout
+        self.inline_cost = inline_cost
+        self._executor = None
+        self._warmup = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.recycled = 0
+
+    # Starts the worker processes and runs warmup once in each of them, so the
+    # first real requests do not pay for process start-up and imports
+    def start(self, warmup=None):
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._warmup = warmup
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            executor = self._executor
+        if warmup is not None:
+            wait([executor.submit(warmup) for _ in range(self.max_workers)])
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _current_executor(self):
+        if self._executor is None:
+            self.start()
+        return self._executor
+
+    # Takes count slots or raises PoolBusyError
+    def _admit(self, count=1):
+        with self._lock:
+            if self._pending + count > self.max_pending:
+                self.rejected += 1
+                raise PoolBusyError(f"{self._pending} generation jobs already in flight (limit {self.max_pending})")
+            self._pending += count
+
+    def _release(self, *_):
+        with self._lock:
+            self._pending -= 1
+
+    # Submits fn(*args) to the executor; the slot is given back when the job
+    # is done, whether it succeeded, failed or was killed
+    def _submit(self, fn, *args):
+        executor = self._current_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died while the pool sat idle
+            self._recycle(executor)
+            executor = self._current_executor()
+            future = executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return executor, future
+
+    # Replaces executor (if it is still the current one) with a fresh one and
+    # terminates its workers, which stops jobs that ran past the timeout
+    def _recycle(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self.recycled += 1
+            if self._warmup is not None:
+                for _ in range(self.max_workers):
+                    self._executor.submit(self._warmup)
+        terminate = getattr(executor, "terminate_workers", None)
+        if terminate is not None:
+            terminate()
+        else:
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args, cost=None):
+        self._admit()
+        if cost is not None and cost <= self.inline_cost:
+            try:
+                result = await asyncio.to_thread(fn, *args)
+            finally:
+                self._release()
+            self.completed += 1
+            return result
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        try:
+            executor, future = self._submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        crashed = False
+        while True:
+            try:
+                result = await asyncio.wait_for(asyncio.wrap_future(future), max(deadline - loop.time(), 0))
+                break
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                self._recycle(executor)
+                raise
+            except BrokenProcessPool:
+                # Killed along with a timed-out job, or a worker died: try again
+                # on a fresh executor, but only once if this job's own executor
+                # broke, in case the job is what kills it
+                if executor is self._executor:
+                    self._recycle(executor)
+                    if crashed:
+                        raise
+                    crashed = True
+                if loop.time() >= deadline:
+                    raise
+                self._admit()
+                try:
+                    executor, future = self._submit(fn, *args)
+                except BaseException:
+                    self._release()
+                    raise
+        self.completed += 1
+        return result
+
+    # Wraps chunks, an iterator consumed outside the pool (e.g. by a streamed
+    # response), so it holds a slot until it is exhausted, closed or dropped,
+    # and stops with TimeoutError once it has run for longer than timeout
+    # (the pool's timeout by default). Raises PoolBusyError straight away
+    # like run().
+    def stream(self, chunks, timeout=None):
+        self._admit()
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        held = self._hold(chunks, deadline)
+        # Enter the try block now, so closing an unstarted stream still
+        # gives the slot back
+        next(held)
+        return held
+
+    def _hold(self, chunks, deadline):
+        try:
+            yield
+            for chunk in chunks:
+                if time.monotonic() > deadline:
+                    self.timed_out += 1
+                    raise TimeoutError("Streamed generation ran past its deadline")
+                yield chunk
+            self.completed += 1
+        finally:
+            self._release()
+
+    # Maps fn over items in the worker processes and waits for all results.
+    # For code already running off the event loop (in a thread) that wants to
+    # fan one job out across the workers, e.g. tiles of a big image. At most
+    # max_workers items are in flight at once, holding one slot each. If a
+    # worker dies, the executor is recycled and the unfinished items are run
+    # once more.
+    def map(self, fn, items):
+        items = list(items)
+        if not items:
+            return []
+        window = min(len(items), self.max_workers)
+        self._admit(window)
+        results = [None] * len(items)
+        finished = set()
+        in_flight = {}
+        crashed = False
+        try:
+            while True:
+                executor = self._current_executor()
+                try:
+                    self._map_window(executor, fn, items, results, finished, in_flight, window)
+                    break
+                except BrokenProcessPool:
+                    self._recycle(executor)
+                    if crashed:
+                        raise
+                    crashed = True
+                    for future in [future for future in in_flight if future.done()]:
+                        del in_flight[future]
+                except FutureTimeoutError:
+                    self.timed_out += 1
+                    self._recycle(executor)
+                    raise
+        finally:
+            # Items still running (after an error) keep their slot until done
+            for future in in_flight:
+                future.add_done_callback(self._release)
+            with self._lock:
+                self._pending -= window - len(in_flight)
+        self.completed += 1
+        return results
+
+    # Runs the items of map() not finished yet, at most window at a time
+    def _map_window(self, executor, fn, items, results, finished, in_flight, window):
+        for index, item in enumerate(items):
+            if index in finished or index in in_flight.values():
+                continue
+            if len(in_flight) == window:
+                self._collect(wait(in_flight, timeout=self.timeout, return_when="FIRST_COMPLETED")[0],
+                              results, finished, in_flight)
+            in_flight[executor.submit(fn, item)] = index
+        if in_flight:
+            done, not_done = wait(in_flight, timeout=self.timeout)
+            if not_done:
+                raise FutureTimeoutError()
+            self._collect(done, results, finished, in_flight)
+
+    @staticmethod
+    def _collect(done, results, finished, in_flight):
+        if not done:
+            raise FutureTimeoutError()
+        for future in done:
+            result = future.result()
+            index = in_flight.pop(future)
+            results[index] = result
+            finished.add(index)
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "timeout": self.timeout,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "recycled": self.recycled,
+        }
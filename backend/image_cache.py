@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from kolam_analysis import load_image
+
+# Near-duplicate cache for results computed from uploaded images.
+#
+# People re-upload the same kolam photo, often recompressed or resized, so
+# results are keyed by perceptual hashes instead of by the bytes. The hashes
+# come from a normalized thumbnail that does not depend on the upload's size:
+# the picture is decoded small, the floor is flattened out (ink is the
+# distance from a median-filtered background, for either polarity) and the
+# ink is cropped to where 98% of it lies, so margins, lighting and resolution
+# drop out. From that crop come a 64-bit dHash (signs of horizontal gradients
+# on a 9x8 copy) and a 64-bit pHash (signs of the low 8x8 DCT coefficients of
+# a 32x32 copy around their median). A lookup matches an entry when both
+# hashes are within a Hamming distance tolerance, so one hash has to agree
+# with the other before a stored result is reused. Entries are kept in an
+# LRU; the near-duplicate search is one XOR and popcount over all stored
+# hashes.
+#
+# The crop's size in original pixels is returned too, so results holding
+# pixel measurements can be scaled for a re-upload at another size.
+
+# Hashes are HASH_SIZE x HASH_SIZE bits
+HASH_SIZE = 8
+PHASH_SIZE = 32
+HASH_WORDS = HASH_SIZE * HASH_SIZE // 64
+
+# Side the image is decoded to before cropping; small kolams on a big sheet
+# still need a few dozen pixels once cropped
+HASH_WORK_SIZE = 256
+
+# Share of the ink left outside the crop on each side
+INK_CROP_QUANTILE = 0.01
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
+
+# Bits as a tuple of HASH_WORDS 64-bit ints
+def _pack_bits(bits):
+    return tuple(int(word) for word in np.packbits(bits.ravel()).view(">u8"))
+
+
+def _resize(pixels, size):
+    return np.asarray(Image.fromarray(pixels, mode="F").resize(size, Image.BOX), dtype=np.float64)
+
+
+# Ink as distance from the background: a median filter over a coarse copy
+# removes the strokes and keeps the lighting, whichever way round the ink is
+def _ink(pixels):
+    h, w = pixels.shape
+    small = Image.fromarray(pixels, mode="F").resize((max(1, w // 8), max(1, h // 8)), Image.BOX)
+    small = small.filter(ImageFilter.MedianFilter(5))
+    background = np.asarray(small.resize((w, h), Image.BILINEAR), dtype=np.float32)
+    return np.abs(pixels - background)
+
+
+def _quantile_bounds(profile, quantile):
+    total = np.cumsum(profile)
+    return (int(np.searchsorted(total, quantile * total[-1])),
+            int(np.searchsorted(total, (1 - quantile) * total[-1])) + 1)
+
+
+# Box (y0, y1, x0, x1) holding all but INK_CROP_QUANTILE of the ink on each
+# side, so the same kolam with a different margin or a slightly different crop
+# hashes the same; faint noise below 30% of the strong strokes is ignored
+def _ink_box(ink):
+    level = 0.3 * np.percentile(ink, 99.5)
+    mass = np.maximum(ink - level, 0)
+    if level <= 0 or not mass.any():
+        return 0, ink.shape[0], 0, ink.shape[1]
+    return (*_quantile_bounds(mass.sum(axis=1), INK_CROP_QUANTILE),
+            *_quantile_bounds(mass.sum(axis=0), INK_CROP_QUANTILE))
+
+
+# ((dHash, pHash), original (width, height), ink extent) of image bytes. The
+# hashes are tuples of HASH_WORDS 64-bit ints; the ink extent is the diagonal
+# of the ink crop in original pixels.
+def image_fingerprint(raw):
+    pixels, original_size = load_image(raw, max_side=HASH_WORK_SIZE)
+    ink = _ink(pixels)
+    y0, y1, x0, x1 = _ink_box(ink)
+    ink = ink[y0:y1, x0:x1]
+    extent = float(np.hypot(x1 - x0, y1 - y0) * original_size[0] / pixels.shape[1])
+
+    small = _resize(ink, (HASH_SIZE + 1, HASH_SIZE))
+    # Steps smaller than this are flat paper, where plain sign tests would
+    # just hash compression noise
+    flat = 0.02 * max(np.ptp(small), 1e-6)
+    dhash = _pack_bits(small[:, 1:] - small[:, :-1] > flat)
+
+    coefficients = (_DCT @ _resize(ink, (PHASH_SIZE, PHASH_SIZE)) @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    # The DC term only says how much ink there is; leave it out of the median
+    phash = _pack_bits(coefficients > np.median(coefficients.ravel()[1:]))
+    return (dhash, phash), original_size, extent
+
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(*values.shape, 8), axis=-1).sum(axis=-1)
+
+
+class PerceptualCache:
+    def __init__(self, max_entries=256, tolerance=8):
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Result stored for an image within tolerance of hashes, for the given
+    # kind of result (e.g. "analysis" with its options), or None
+    def get(self, kind, hashes):
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == kind]
+            if keys:
+                stored = np.array([key[1] for key in keys], dtype=np.uint64)
+                wanted = np.array(hashes, dtype=np.uint64)
+                # Per-hash Hamming distances, shape (entries, 2)
+                distances = _popcount(stored ^ wanted).sum(axis=2)
+                within = np.flatnonzero((distances <= self.tolerance).all(axis=1))
+                if len(within):
+                    best = keys[within[np.argmin(distances[within].sum(axis=1))]]
+                    self._entries.move_to_end(best)
+                    self.hits += 1
+                    return self._entries[best]
+            self.misses += 1
+            return None
+
+    def put(self, kind, hashes, value):
+        with self._lock:
+            key = (kind, tuple(hashes))
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "tolerance": self.tolerance,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,125 @@
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+from kolam_analysis import ImageDecodeError
+
+# Streaming readers for image uploads.
+#
+# Images can come in as a raw image/* (or application/octet-stream) body or as
+# a multipart/form-data file field, so clients do not have to base64-encode
+# them into JSON. The body is read chunk by chunk as it arrives and the upload
+# is refused as soon as it goes over the size limit (or straight away when
+# Content-Length already says it will), so an oversized upload is never
+# buffered in full. Multipart bodies are parsed on the fly and only the image
+# part is kept.
+
+# Form fields taken as the image, in order of preference; otherwise the first
+# part with a filename is used
+IMAGE_FIELD_NAMES = (b"image", b"file")
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+def _check_content_length(request, max_bytes):
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > max_bytes:
+        raise UploadTooLargeError(f"Upload of {length} bytes is over the limit of {max_bytes} bytes")
+
+
+# Reads the whole body, giving up once it passes max_bytes
+async def read_limited_body(request, max_bytes):
+    _check_content_length(request, max_bytes)
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise UploadTooLargeError(f"Upload is over the limit of {max_bytes} bytes")
+    return body
+
+
+# Collects the image part of a multipart body as it is parsed
+class _ImagePartCollector:
+    def __init__(self):
+        self.image = None
+        self.preference = len(IMAGE_FIELD_NAMES) + 1
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._data = None
+        self._candidate = None
+
+    def on_part_begin(self):
+        self._disposition = b""
+        self._data = None
+
+    def on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name")
+        if name in IMAGE_FIELD_NAMES:
+            preference = IMAGE_FIELD_NAMES.index(name)
+        elif b"filename" in options:
+            preference = len(IMAGE_FIELD_NAMES)
+        else:
+            return
+        if preference < self.preference:
+            self._data = bytearray()
+            self._candidate = preference
+
+    def on_part_data(self, data, start, end):
+        if self._data is not None:
+            self._data += data[start:end]
+
+    def on_part_end(self):
+        if self._data is not None:
+            self.image = self._data
+            self.preference = self._candidate
+            self._data = None
+
+    def callbacks(self):
+        return {name: getattr(self, name) for name in (
+            "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+            "on_headers_finished", "on_part_data", "on_part_end")}
+
+
+# Raw image bytes from a multipart/form-data or raw image body
+async def read_image_upload(request, max_bytes):
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data":
+        body = await read_limited_body(request, max_bytes)
+        if not body:
+            raise ImageDecodeError("Empty image upload")
+        return body
+
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise ImageDecodeError("Missing boundary in multipart upload")
+    _check_content_length(request, max_bytes)
+    collector = _ImagePartCollector()
+    parser = MultipartParser(boundary, collector.callbacks())
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadTooLargeError(f"Upload is over the limit of {max_bytes} bytes")
+            parser.write(chunk)
+        parser.finalize()
+    except ValueError as e:
+        raise ImageDecodeError(f"Invalid multipart upload: {e}")
+    if not collector.image:
+        raise ImageDecodeError("No image field in multipart upload")
+    return collector.image
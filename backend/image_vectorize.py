@@ -0,0 +1,420 @@
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from kolam_analysis import decode_base64_image, load_image
+from svg_path import format_number, relative_path_data
+
+# Turns a photo or scan of a kolam into a compact SVG.
+#
+# The work is a list of named stages, each a function (value, context) ->
+# value run and timed by run_pipeline:
+#
+#   decode       image bytes -> grayscale pixels
+#   binarize     pixels -> ink mask (background-corrected Otsu threshold)
+#   skeletonize  mask -> one pixel wide skeleton (Zhang-Suen thinning)
+#   trace        skeleton -> ordered polylines
+#   simplify     polylines -> Douglas-Peucker vertices
+#   fit_arcs     vertices -> line and arc commands
+#   svg          commands -> SVG text
+#
+# Callers can swap, drop or add stages (see replace_stage). Every stage works on
+# whole NumPy arrays: thinning runs through lookup tables over shifted copies
+# of the image, and tracing orders the skeleton by pointer jumping over its
+# half-edges instead of walking it pixel by pixel. Big masks are thinned in
+# overlapping tiles, mapped over context["executor"] when one is given.
+
+# Longest side of the image the pipeline works on
+VECTORIZE_MAX_SIDE = 2048
+
+# Masks bigger than this on either side are thinned in tiles. The overlap has
+# to cover the widest stroke, since thinning eats one pixel per pass from each
+# side.
+SKELETON_TILE_SIZE = 512
+SKELETON_TILE_OVERLAP = 32
+
+# Polylines with fewer pixels than this are dropped (specks, dots and spurs)
+MIN_POLYLINE_PIXELS = 8
+
+# Douglas-Peucker tolerance and the largest deviation (both in pixels) allowed
+# when replacing a run of vertices with one circular arc
+SIMPLIFY_TOLERANCE = 1.0
+ARC_TOLERANCE = 1.5
+
+# Arcs wider than this (relative to the longer image side) are left as lines
+MAX_ARC_RADIUS = 0.75
+
+SVG_TEMPLATE = (
+    '<svg baseProfile="tiny" height="{height}px" version="1.2" viewBox="0 0 {width} {height}" width="{width}px" '
+    'xmlns="http://www.w3.org/2000/svg" xmlns:ev="http://www.w3.org/2001/xml-events" '
+    'xmlns:xlink="http://www.w3.org/1999/xlink"><rect fill="white" height="100%" width="100%" x="0" y="0" />'
+    '<path d="{path}" fill="none" stroke="black" stroke-linecap="round" stroke-linejoin="round" '
+    'stroke-width="{stroke_width}" /></svg>'
+)
+
+
+def decode_stage(raw, context):
+    if isinstance(raw, str):
+        raw = decode_base64_image(raw)
+    pixels, original_size = load_image(raw, context.get("max_side", VECTORIZE_MAX_SIDE))
+    context["size"] = (pixels.shape[1], pixels.shape[0])
+    context["original_size"] = original_size
+    return pixels
+
+
+# Otsu threshold of a uint8-range image, from its histogram
+def otsu_threshold(values):
+    histogram = np.bincount(np.clip(values, 0, 255).astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    total_weight, total_mean = weights[-1], means[-1]
+    background = weights
+    foreground = total_weight - weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (total_mean * background - means * total_weight) ** 2 / (background * foreground)
+    return int(np.nanargmax(np.where(np.isfinite(between), between, np.nan)))
+
+
+# Ink mask. The paper (or floor) level is estimated on a 1/8 scale copy with
+# a max filter for dark ink, or a min filter for light ink, so lines do not
+# drag it towards the ink; distance from it is then thresholded with Otsu.
+# This copes with uneven lighting and with either polarity.
+def binarize(pixels, context):
+    h, w = pixels.shape
+    dark_ink = np.median(pixels) > pixels.mean()
+    small = Image.fromarray(pixels, mode="F").resize((max(1, w // 8), max(1, h // 8)), Image.BOX)
+    small = small.filter(ImageFilter.MaxFilter(5) if dark_ink else ImageFilter.MinFilter(5))
+    background = np.asarray(small.resize((w, h), Image.BILINEAR), dtype=np.float32)
+    ink = background - pixels if dark_ink else pixels - background
+    mask = ink > max(otsu_threshold(ink), 1)
+    context["ink_pixels"] = int(mask.sum())
+    return mask
+
+
+# Zhang-Suen deletion tables, indexed by the 8-bit neighbourhood code with bit
+# i set for neighbour P(i + 2), clockwise from north
+def _thinning_tables():
+    codes = np.arange(256)
+    bits = (codes[:, None] >> np.arange(8)) & 1
+    p2, p3, p4, p5, p6, p7, p8, p9 = bits.T
+    count = bits.sum(axis=1)
+    transitions = ((bits == 0) & (np.roll(bits, -1, axis=1) == 1)).sum(axis=1)
+    base = (count >= 2) & (count <= 6) & (transitions == 1)
+    first = base & (p2 * p4 * p6 == 0) & (p4 * p6 * p8 == 0)
+    second = base & (p2 * p4 * p8 == 0) & (p2 * p6 * p8 == 0)
+    return first, second
+
+
+_THINNING_TABLES = _thinning_tables()
+
+# (dy, dx) of P2..P9
+_NEIGHBOUR_OFFSETS = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+
+
+def _neighbour_codes(mask):
+    h, w = mask.shape
+    padded = np.pad(mask, 1).view(np.uint8)
+    code = np.zeros((h, w), dtype=np.uint8)
+    for bit, (dy, dx) in enumerate(_NEIGHBOUR_OFFSETS):
+        code |= padded[1 + dy:1 + dy + h, 1 + dx:1 + dx + w] << bit
+    return code
+
+
+def thin(mask):
+    mask = mask.copy()
+    changed = True
+    while changed:
+        changed = False
+        for table in _THINNING_TABLES:
+            delete = mask & table[_neighbour_codes(mask)]
+            if delete.any():
+                mask &= ~delete
+                changed = True
+    return mask
+
+
+def _thin_tile(args):
+    tile, core = args
+    y0, x0, y1, x1 = core
+    return thin(tile)[y0:y1, x0:x1]
+
+
+# Zhang-Suen thinning, in overlapping tiles for big masks
+def skeletonize(mask, context):
+    tile = context.get("tile_size", SKELETON_TILE_SIZE)
+    overlap = context.get("tile_overlap", SKELETON_TILE_OVERLAP)
+    h, w = mask.shape
+    if h <= tile and w <= tile:
+        return thin(mask)
+
+    jobs, slots = [], []
+    for y in range(0, h, tile):
+        for x in range(0, w, tile):
+            y0, x0 = max(y - overlap, 0), max(x - overlap, 0)
+            y1, x1 = min(y + tile + overlap, h), min(x + tile + overlap, w)
+            core = (y - y0, x - x0, min(y + tile, h) - y0, min(x + tile, w) - x0)
+            jobs.append((mask[y0:y1, x0:x1], core))
+            slots.append((slice(y, min(y + tile, h)), slice(x, min(x + tile, w))))
+    executor = context.get("executor")
+    skeleton = np.zeros_like(mask)
+    for slot, part in zip(slots, (executor.map if executor is not None else map)(_thin_tile, jobs)):
+        skeleton[slot] = part
+    return skeleton
+
+
+# Edges of the skeleton graph. Diagonal steps only count where no 4-connected
+# path goes round the corner, so staircases come out as simple paths.
+def _skeleton_edges(skeleton, ids):
+    h, w = skeleton.shape
+    padded = np.pad(skeleton, 1)
+    padded_ids = np.pad(ids, 1, constant_values=-1)
+
+    def shifted(array, dy, dx):
+        return array[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+
+    edges = []
+    for dy, dx in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        linked = skeleton & shifted(padded, dy, dx)
+        if dy and dx:
+            linked &= ~shifted(padded, 0, dx) & ~shifted(padded, dy, 0)
+        edges.append(np.column_stack([ids[linked], shifted(padded_ids, dy, dx)[linked]]))
+    return np.concatenate(edges)
+
+
+# Orders skeleton pixels into polylines. Junction pixels (three or more
+# neighbours) are split into one copy per incident edge, which leaves a graph
+# of simple paths and loops. Each edge becomes two half-edges, and a half-edge
+# u->v is followed by v's other half-edge (or by v->u at an end of a path), so
+# every path or loop is one cycle of half-edges. Pointer jumping labels each
+# cycle with its smallest half-edge (preferring ones that start at a path end)
+# and ranks half-edges along it, all in O(n log n) array operations.
+def trace_skeleton(skeleton, context):
+    min_pixels = context.get("min_polyline_pixels", MIN_POLYLINE_PIXELS)
+    ys, xs = np.nonzero(skeleton)
+    if "ink_pixels" in context and len(xs):
+        # Mean stroke width: ink area over skeleton length
+        context["stroke_width"] = max(1.0, context["ink_pixels"] / len(xs))
+    ids = np.full(skeleton.shape, -1, dtype=np.int64)
+    ids[ys, xs] = np.arange(len(xs))
+    edges = _skeleton_edges(skeleton, ids)
+    if len(edges) == 0:
+        return []
+
+    degree = np.bincount(edges.ravel(), minlength=len(xs))
+    junction = degree >= 3
+    edges = edges[~(junction[edges[:, 0]] & junction[edges[:, 1]])]
+    # One fresh copy of the junction pixel per edge that touches it
+    touches = junction[edges]
+    copies = np.flatnonzero(touches.ravel())
+    copy_of = edges.ravel()[copies]
+    edges.ravel()[copies] = len(xs) + np.arange(len(copies))
+    node_x = np.concatenate([xs, xs[copy_of]]).astype(np.float64)
+    node_y = np.concatenate([ys, ys[copy_of]]).astype(np.float64)
+    n_nodes = len(node_x)
+    if len(edges) == 0:
+        return []
+
+    src = edges.ravel()
+    dst = edges[:, ::-1].ravel()
+    n_half = len(src)
+    degree = np.bincount(src, minlength=n_nodes)
+
+    # First and second outgoing half-edge of every node
+    order = np.argsort(src, kind="stable")
+    first_out = np.full(n_nodes, -1, dtype=np.int64)
+    second_out = np.full(n_nodes, -1, dtype=np.int64)
+    starts = np.searchsorted(src[order], np.arange(n_nodes))
+    has_out = degree > 0
+    first_out[has_out] = order[starts[has_out]]
+    has_two = degree > 1
+    second_out[has_two] = order[starts[has_two] + 1]
+
+    reverse = np.arange(n_half) ^ 1
+    at = dst
+    successor = np.where(degree[at] == 1, reverse,
+                         np.where(first_out[at] == reverse, second_out[at], first_out[at]))
+
+    offset = 2 * n_half
+    label = np.arange(n_half) + np.where(degree[src] == 1, 0, offset)
+    jump = successor.copy()
+    for _ in range(max(1, int(np.ceil(np.log2(n_half))) + 1)):
+        label = np.minimum(label, label[jump])
+        jump = jump[jump]
+    is_open = label < offset
+    leader = label % offset
+
+    # Break each cycle in front of its leader and rank by distance to the break
+    following = np.where(successor == leader, -1, successor)
+    distance = (following >= 0).astype(np.int64)
+    for _ in range(max(1, int(np.ceil(np.log2(n_half))) + 1)):
+        active = following >= 0
+        distance[active] += distance[following[active]]
+        following[active] = following[following[active]]
+
+    # Loops show up twice, once per direction; keep the even-led one
+    keep = is_open | (leader % 2 == 0)
+    half_edges = np.flatnonzero(keep)
+    half_edges = half_edges[np.lexsort((-distance[half_edges], leader[half_edges]))]
+    boundaries = np.flatnonzero(np.diff(leader[half_edges])) + 1
+
+    polylines = []
+    for cycle, open_path in zip(np.split(half_edges, boundaries), is_open[half_edges[np.r_[0, boundaries]]]):
+        if open_path:
+            # The cycle runs out to the far end and back; keep the way out
+            cycle = cycle[:len(cycle) // 2]
+            nodes = np.append(src[cycle], dst[cycle[-1]])
+        else:
+            nodes = np.append(src[cycle], src[cycle[0]])
+        if len(nodes) >= min_pixels:
+            polylines.append(np.column_stack([node_x[nodes], node_y[nodes]]))
+    return polylines
+
+
+# Indices of the points Douglas-Peucker keeps
+def douglas_peucker(points, tolerance):
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        segment = points[last] - points[first]
+        offsets = points[first + 1:last] - points[first]
+        length = np.hypot(*segment)
+        if length > 0:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        else:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        worst = int(np.argmax(distances))
+        if distances[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def simplify_polylines(polylines, context):
+    tolerance = context.get("simplify_tolerance", SIMPLIFY_TOLERANCE)
+    return [(points, douglas_peucker(points, tolerance)) for points in polylines]
+
+
+# Least-squares circle through points; returns (cx, cy, r, largest deviation)
+def fit_circle(points):
+    mean = points.mean(axis=0)
+    x, y = (points - mean).T
+    design = np.column_stack([x, y, np.ones(len(x))])
+    (d, e, f), *_ = np.linalg.lstsq(design, -(x * x + y * y), rcond=None)
+    cx, cy = -d / 2, -e / 2
+    r2 = cx * cx + cy * cy - f
+    if r2 <= 0:
+        return 0.0, 0.0, 0.0, np.inf
+    r = np.sqrt(r2)
+    deviation = np.abs(np.hypot(x - cx, y - cy) - r).max()
+    return cx + mean[0], cy + mean[1], r, deviation
+
+
+# Line and arc commands for one simplified polyline. Runs of vertices are
+# merged into the longest arc that stays within the tolerance; whatever is
+# left is drawn as straight lines.
+def _polyline_commands(points, vertices, tolerance, max_radius):
+    ends, is_arc, radii, large_arc, sweep = [], [], [], [], []
+
+    def add(end, arc=False, radius=0.0, large=False, clockwise=False):
+        ends.append(end)
+        is_arc.append(arc)
+        radii.append(radius)
+        large_arc.append(large)
+        sweep.append(clockwise)
+
+    i = 0
+    while i < len(vertices) - 1:
+        best = None
+        for j in range(i + 2, len(vertices)):
+            run = points[vertices[i]:vertices[j] + 1]
+            cx, cy, r, deviation = fit_circle(run)
+            if deviation > tolerance or r > max_radius:
+                break
+            best = (j, cx, cy, r, run)
+        if best is None:
+            add(points[vertices[i + 1]])
+            i += 1
+            continue
+
+        j, cx, cy, r, run = best
+        angles = np.unwrap(np.arctan2(run[:, 1] - cy, run[:, 0] - cx))
+        turn = angles[-1] - angles[0]
+        if abs(turn) > 1.9 * np.pi:
+            # A (nearly) full circle can not be one SVG arc; go halfway first
+            middle = run[len(run) // 2]
+            add(middle, True, r, False, turn > 0)
+            add(run[-1], True, r, abs(turn) > 3 * np.pi, turn > 0)
+        else:
+            add(run[-1], True, r, abs(turn) > np.pi, turn > 0)
+        i = j
+    return (np.array(ends, dtype=np.float64).reshape(-1, 2), np.array(is_arc, dtype=bool),
+            np.array(radii), np.array(large_arc, dtype=bool), np.array(sweep, dtype=bool))
+
+
+def fit_arcs(simplified, context):
+    tolerance = context.get("arc_tolerance", ARC_TOLERANCE)
+    max_radius = MAX_ARC_RADIUS * max(context.get("size", (1, 1)))
+    return [(points[0], _polyline_commands(points, vertices, tolerance, max_radius))
+            for points, vertices in simplified]
+
+
+def emit_svg(strokes, context):
+    precision = context.get("precision", 1)
+    width, height = context["size"]
+    paths = [relative_path_data(start[0], start[1], *commands, precision=precision)
+             for start, commands in strokes if len(commands[0])]
+    return SVG_TEMPLATE.format(width=width, height=height, path=" ".join(paths),
+                               stroke_width=format_number(round(context.get("stroke_width", 2), 1)))
+
+
+VECTORIZE_STAGES = (
+    ("decode", decode_stage),
+    ("binarize", binarize),
+    ("skeletonize", skeletonize),
+    ("trace", trace_skeleton),
+    ("simplify", simplify_polylines),
+    ("fit_arcs", fit_arcs),
+    ("svg", emit_svg),
+)
+
+
+# Copy of stages with the stage called name swapped for fn
+def replace_stage(stages, name, fn):
+    if name not in dict(stages):
+        raise KeyError(f"No vectorize stage named {name!r}")
+    return tuple((stage_name, fn if stage_name == name else stage) for stage_name, stage in stages)
+
+
+# Runs value through the stages. Returns (result, {stage name: milliseconds}).
+# Extra keyword arguments go into the context every stage sees.
+def run_pipeline(value, stages=VECTORIZE_STAGES, **context):
+    timings = {}
+    for name, stage in stages:
+        start = time.perf_counter()
+        value = stage(value, context)
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+    return value, timings
+
+
+# Image (base64 text or bytes) to SVG text, with per-stage timings
+def vectorize_image(data, executor=None, **options):
+    return run_pipeline(data, executor=executor, **options)
+
+
+# Total stroke length and mean stroke width of decoded grayscale pixels, both
+# in pixels of that array, from the binarize to simplify stages. Lengths are
+# taken along the simplified vertices, since the pixel staircase of a
+# skeleton overstates them.
+def measure_strokes(pixels, **options):
+    context = dict(options)
+    skeleton = skeletonize(binarize(pixels, context), context)
+    simplified = simplify_polylines(trace_skeleton(skeleton, context), context)
+    length = sum(float(np.hypot(*np.diff(points[vertices], axis=0).T).sum()) for points, vertices in simplified)
+    return length, context.get("stroke_width", 0.0)
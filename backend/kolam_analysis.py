@@ -0,0 +1,235 @@
+import base64
+import binascii
+import io
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from dot_grid import DOT_WORK_SIZE, analyze_dot_grid, describe_grid
+
+# Symmetry analysis for photos and scans of kolams.
+#
+# The image is decoded straight to a small working resolution (JPEG draft mode
+# skips most of the decode work for big phone photos), turned into an edge
+# map so ink-on-floor and chalk-on-ink look the same, and resampled onto a
+# polar grid around the symmetry centre. Along each ring, rotational symmetry
+# shows up as peaks in the circular autocorrelation and mirror symmetry as
+# peaks in the circular self-convolution, and both come out of one FFT per
+# ring instead of rotating and comparing the image for every candidate angle.
+# The dot grid is found separately by dot_grid on a larger working copy.
+
+# Longest side of the image the analysis works on
+WORK_SIZE = 256
+
+# Angular samples per ring; divisible by every fold we test
+POLAR_ANGLES = 360
+
+# Rotation orders tested, highest first
+ROTATION_FOLDS = (8, 4, 2)
+
+# Normalized correlation needed to call a symmetry present
+SYMMETRY_THRESHOLD = 0.6
+
+
+class ImageDecodeError(ValueError):
+    pass
+
+
+# Raw image bytes from a base64 string, with or without a data: URL prefix
+def decode_base64_image(data):
+    if data.startswith("data:"):
+        data = data.partition(",")[2]
+    try:
+        return base64.b64decode(data, validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise ImageDecodeError(f"Invalid base64 image data: {e}")
+
+
+# Decodes image bytes to a grayscale float32 array no larger than max_side on
+# either side. Returns (pixels, (original_width, original_height)).
+def load_image(raw, max_side=WORK_SIZE):
+    try:
+        img = Image.open(io.BytesIO(raw))
+        original_size = img.size
+        # EXIF orientations 5-8 turn the picture by a quarter turn
+        if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            original_size = original_size[::-1]
+        # Lets the JPEG decoder scale down by 1/2..1/8 while decoding
+        img.draft("L", (max_side, max_side))
+        img = ImageOps.exif_transpose(img).convert("L")
+    except (OSError, SyntaxError, ValueError) as e:
+        raise ImageDecodeError(f"Could not decode image: {e}")
+    if img.width > max_side or img.height > max_side:
+        img.thumbnail((max_side, max_side), Image.BILINEAR)
+    return np.asarray(img, dtype=np.float32), original_size
+
+
+# Gradient magnitude with the flat background suppressed
+def edge_map(pixels):
+    gx = np.zeros_like(pixels)
+    gy = np.zeros_like(pixels)
+    gx[:, 1:-1] = pixels[:, 2:] - pixels[:, :-2]
+    gy[1:-1, :] = pixels[2:, :] - pixels[:-2, :]
+    magnitude = np.hypot(gx, gy)
+    return np.maximum(magnitude - np.median(magnitude), 0)
+
+
+# Point symmetric under a half turn, found as the peak of the self-convolution
+# (f(x) = f(2c - x) makes sum f(y) f(2c - y) peak at 2c). Falls back to the
+# weighted centroid when there is no clear half-turn symmetry.
+def symmetry_centre(weights):
+    h, w = weights.shape
+    total = weights.sum()
+    if total <= 0:
+        return (w - 1) / 2, (h - 1) / 2
+
+    spectrum = np.fft.rfft2(weights, s=(2 * h, 2 * w))
+    convolution = np.fft.irfft2(spectrum * spectrum, s=(2 * h, 2 * w))
+    peak_y, peak_x = np.unravel_index(np.argmax(convolution), convolution.shape)
+    if convolution[peak_y, peak_x] >= SYMMETRY_THRESHOLD * np.sum(weights * weights):
+        return peak_x / 2, peak_y / 2
+
+    ys, xs = np.indices(weights.shape)
+    return float((xs * weights).sum() / total), float((ys * weights).sum() / total)
+
+
+# Bilinear resampling of pixels onto rings around (cx, cy). Returns a
+# (radii, angles) array; the largest ring still fits inside the image.
+def polar_resample(pixels, cx, cy, n_angles=POLAR_ANGLES):
+    h, w = pixels.shape
+    max_radius = int(min(cx, cy, w - 1 - cx, h - 1 - cy))
+    if max_radius < 2:
+        return np.zeros((0, n_angles), dtype=np.float32)
+
+    radii = np.arange(1, max_radius + 1, dtype=np.float32)
+    angles = np.arange(n_angles) * (2 * np.pi / n_angles)
+    xs = cx + radii[:, None] * np.cos(angles)[None, :]
+    ys = cy + radii[:, None] * np.sin(angles)[None, :]
+
+    x0 = np.clip(np.floor(xs).astype(np.intp), 0, w - 2)
+    y0 = np.clip(np.floor(ys).astype(np.intp), 0, h - 2)
+    fx = xs - x0
+    fy = ys - y0
+    top = pixels[y0, x0] * (1 - fx) + pixels[y0, x0 + 1] * fx
+    bottom = pixels[y0 + 1, x0] * (1 - fx) + pixels[y0 + 1, x0 + 1] * fx
+    return (top * (1 - fy) + bottom * fy).astype(np.float32)
+
+
+# Symmetry scores of a polar image. Each ring is mean-centred and weighted by
+# its radius (its share of the image area), then:
+#   rotation: autocorrelation at lag 360/n, i.e. how well the image matches
+#             itself turned by 360/n degrees, for each n in ROTATION_FOLDS
+#   mirror:   best self-convolution lag; a peak at lag s means the image
+#             matches its reflection about the axis at s/2
+# Scores are normalized so that 1 is a perfect match.
+def symmetry_scores(polar):
+    n_angles = polar.shape[1]
+    if len(polar) == 0:
+        return {fold: 0.0 for fold in ROTATION_FOLDS}, 0.0, 0.0
+
+    rings = polar - polar.mean(axis=1, keepdims=True)
+    ring_weights = np.arange(1, len(rings) + 1, dtype=np.float64)[:, None]
+    spectrum = np.fft.rfft(rings, axis=1)
+
+    autocorrelation = np.fft.irfft((ring_weights * np.abs(spectrum) ** 2).sum(axis=0), n=n_angles)
+    energy = autocorrelation[0]
+    if energy <= 1e-9:
+        return {fold: 0.0 for fold in ROTATION_FOLDS}, 0.0, 0.0
+
+    rotation = {fold: float(autocorrelation[n_angles // fold] / energy) for fold in ROTATION_FOLDS}
+
+    convolution = np.fft.irfft((ring_weights * spectrum * spectrum).sum(axis=0), n=n_angles)
+    best = int(np.argmax(convolution))
+    mirror = float(convolution[best] / energy)
+    axis_angle = (best * 360.0 / n_angles / 2) % 180.0
+    return rotation, mirror, axis_angle
+
+
+# Full analysis of decoded grayscale pixels
+def analyze_symmetry(pixels):
+    weights = edge_map(pixels)
+    cx, cy = symmetry_centre(weights)
+    rotation, mirror, axis_angle = symmetry_scores(polar_resample(weights, cx, cy))
+
+    fold = next((fold for fold in ROTATION_FOLDS if rotation[fold] >= SYMMETRY_THRESHOLD), 1)
+    has_mirror = mirror >= SYMMETRY_THRESHOLD
+    return {
+        "fold": fold,
+        "mirror": has_mirror,
+        "mirrorAxes": fold if has_mirror else 0,
+        "mirrorAxisAngle": round(axis_angle, 1) if has_mirror else None,
+        "centre": (round(float(cx) / pixels.shape[1], 4), round(float(cy) / pixels.shape[0], 4)),
+        "scores": {
+            **{f"C{fold}": round(score, 3) for fold, score in rotation.items()},
+            "mirror": round(mirror, 3),
+        },
+    }
+
+
+# symmetryType / rotationPatterns as shown by the analyze page
+def describe_symmetry(symmetry):
+    fold = symmetry["fold"]
+    if fold > 1:
+        symmetry_type = f"{fold}-fold Rotational Symmetry"
+        if symmetry["mirror"]:
+            symmetry_type += f" with {symmetry['mirrorAxes']} Mirror Axes"
+    elif symmetry["mirror"]:
+        symmetry_type = "Mirror Symmetry"
+    else:
+        symmetry_type = "No Symmetry Detected"
+
+    step = 360 // fold
+    rotation_patterns = [f"{angle}° rotation" for angle in range(step, 361, step)]
+    if symmetry["mirror"]:
+        rotation_patterns.append(f"Reflection about {symmetry['mirrorAxisAngle']}° axis")
+    return symmetry_type, rotation_patterns
+
+
+# Shrinks a pixel array so neither side is over max_side
+def downscale(pixels, max_side):
+    h, w = pixels.shape
+    if max(h, w) <= max_side:
+        return pixels
+    factor = max_side / max(h, w)
+    size = (max(1, round(w * factor)), max(1, round(h * factor)))
+    return np.asarray(Image.fromarray(pixels, mode="F").resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+# Decodes and analyzes an image (raw bytes or base64 text); runs in the
+# generation pool
+def analyze_kolam_image_data(data):
+    if isinstance(data, str):
+        data = decode_base64_image(data)
+    pixels, (width, height) = load_image(data, DOT_WORK_SIZE)
+    symmetry = analyze_symmetry(downscale(pixels, WORK_SIZE))
+    symmetry_type, rotation_patterns = describe_symmetry(symmetry)
+    scale = width / pixels.shape[1]
+    grid = analyze_dot_grid(pixels, scale=scale)
+    # image_vectorize imports this module, so its stages are imported here
+    from image_vectorize import measure_strokes
+    line_length, stroke_width = measure_strokes(pixels)
+    return {
+        "symmetryType": symmetry_type,
+        "rotationPatterns": rotation_patterns,
+        "symmetry": symmetry,
+        "gridSystem": describe_grid(grid),
+        "dotGrid": grid,
+        "dimensions": f"{width} x {height} pixels",
+        # Skeleton length and mean stroke width, in pixels of the original image
+        "lineLength": round(line_length * scale, 1),
+        "strokeWidth": round(stroke_width * scale, 1),
+    }
+
+
+# Copy of an analysis made from another upload of the same kolam, for an image
+# of the given (width, height) whose ink is factor times as big
+def rescale_analysis(analysis, factor, size):
+    result = dict(analysis)
+    result["dimensions"] = f"{size[0]} x {size[1]} pixels"
+    result["lineLength"] = round(analysis["lineLength"] * factor, 1)
+    result["strokeWidth"] = round(analysis["strokeWidth"] * factor, 1)
+    grid = analysis["dotGrid"]
+    if grid is not None:
+        result["dotGrid"] = dict(grid, spacing=round(grid["spacing"] * factor, 1),
+                                 dotRadius=round(grid["dotRadius"] * factor, 1))
+    return result
@@ -0,0 +1,192 @@
+from functools import lru_cache
+
+import numpy as np
+
+from svg_path import relative_path_data
+
+# Geometry-only kolam engine. Turns an expanded L-System string into a NumPy
+# structured array of primitives (lines and arcs) in SVG coordinates (y grows
+# downwards). SVG, CSV and OpenCV exporters all read from this one array, so the
+# geometry is computed once per request whatever formats are produced.
+
+LINE = 0
+ARC = 1
+
+GEOMETRY_DTYPE = np.dtype([
+    ("kind", np.uint8),      # LINE or ARC
+    ("x0", np.float64),      # start point
+    ("y0", np.float64),
+    ("x1", np.float64),      # end point
+    ("y1", np.float64),
+    ("cx", np.float64),      # arc centre (same as start for lines)
+    ("cy", np.float64),
+    ("r", np.float64),       # arc radius / line length
+    ("sweep", np.float64),   # arc sweep in degrees (0 for lines)
+    ("heading", np.float64), # heading in degrees before the primitive
+])
+
+# Each symbol draws at most two primitives: F is a line, A a quarter arc and B
+# a short line followed by a 270 degree loop around the dot.
+MAX_PRIMITIVES_PER_SYMBOL = 2
+
+
+def forward_units():
+    return 5 / (2 ** 0.5)
+
+
+# Lookup tables indexed by symbol byte: primitive count, and per primitive its
+# kind, size (line length or signed radius) and turn in degrees.
+@lru_cache(maxsize=32)
+def symbol_tables(dot_size):
+    counts = np.zeros(256, dtype=np.intp)
+    kinds = np.zeros((256, MAX_PRIMITIVES_PER_SYMBOL), dtype=np.uint8)
+    sizes = np.zeros((256, MAX_PRIMITIVES_PER_SYMBOL), dtype=np.float64)
+    turns = np.zeros((256, MAX_PRIMITIVES_PER_SYMBOL), dtype=np.float64)
+
+    fu = forward_units()
+    symbols = {
+        "F": [(LINE, dot_size, 0)],
+        "A": [(ARC, dot_size, 90)],
+        "B": [(LINE, fu, 0), (ARC, fu, 270)],
+    }
+    for symbol, primitives in symbols.items():
+        code = ord(symbol)
+        counts[code] = len(primitives)
+        for i, (kind, size, turn) in enumerate(primitives):
+            kinds[code, i] = kind
+            sizes[code, i] = size
+            turns[code, i] = turn
+    for table in (counts, kinds, sizes, turns):
+        table.flags.writeable = False
+    return counts, kinds, sizes, turns
+
+
+# Builds the primitive array for an expanded L-System string in one vectorized
+# pass. Symbols without a drawing (including non-ASCII ones, encoded as "?")
+# are skipped, like the turtle walk did.
+def lsystem_geometry(lsystem_string, dot_size, start_x=0.0, start_y=0.0, start_heading=0.0):
+    codes = np.frombuffer(lsystem_string.encode("ascii", errors="replace"), dtype=np.uint8)
+    counts, kind_table, size_table, turn_table = symbol_tables(dot_size)
+
+    per_symbol = counts[codes]
+    total = int(per_symbol.sum())
+    geom = np.zeros(total, dtype=GEOMETRY_DTYPE)
+    if total == 0:
+        return geom
+
+    # Expand symbols into primitives: which symbol each primitive comes from and
+    # its index inside that symbol.
+    symbol_codes = np.repeat(codes, per_symbol)
+    first = np.cumsum(per_symbol) - per_symbol
+    within = np.arange(total) - np.repeat(first, per_symbol)
+
+    kind = kind_table[symbol_codes, within]
+    size = size_table[symbol_codes, within]
+    turn = turn_table[symbol_codes, within]
+
+    # Heading before each primitive (exclusive running sum of the turns)
+    heading = start_heading + np.cumsum(turn) - turn
+    heading_rad = np.radians(heading)
+
+    is_arc = kind == ARC
+    radius = np.abs(size)
+    # Centre sits to the right of the heading for positive radii (SVG y-down)
+    center_offset = heading_rad + np.where(size > 0, np.pi / 2, -np.pi / 2)
+    start_angle = center_offset + np.pi
+    end_angle = start_angle + np.radians(turn)
+
+    cos_h, sin_h = np.cos(heading_rad), np.sin(heading_rad)
+    # Displacement of the centre and end point relative to the start point
+    ccx = radius * np.cos(center_offset)
+    ccy = radius * np.sin(center_offset)
+    dx = np.where(is_arc, ccx + radius * np.cos(end_angle), size * cos_h)
+    dy = np.where(is_arc, ccy + radius * np.sin(end_angle), size * sin_h)
+
+    x1 = start_x + np.cumsum(dx)
+    y1 = start_y + np.cumsum(dy)
+    x0 = x1 - dx
+    y0 = y1 - dy
+
+    geom["kind"] = kind
+    geom["x0"], geom["y0"] = x0, y0
+    geom["x1"], geom["y1"] = x1, y1
+    geom["cx"] = np.where(is_arc, x0 + ccx, x0)
+    geom["cy"] = np.where(is_arc, y0 + ccy, y0)
+    geom["r"] = radius
+    geom["sweep"] = np.where(is_arc, turn, 0.0)
+    geom["heading"] = heading
+    return geom
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+# Single SVG "d" string for a connected geometry array
+def geometry_to_svg_path(geom, precision=2, move_to=True):
+    if len(geom) == 0:
+        return ""
+    ends = np.column_stack([geom["x1"], geom["y1"]])
+    return relative_path_data(geom["x0"][0], geom["y0"][0], ends, geom["kind"] == ARC, geom["r"],
+                              np.abs(geom["sweep"]) > 180, geom["sweep"] > 0, precision, move_to)
+
+
+# Flattens the geometry into one (N, 2) polyline, sampling arcs every arc_step degrees
+def geometry_to_polyline(geom, arc_step=10.0):
+    if len(geom) == 0:
+        return np.zeros((0, 2), dtype=np.float64)
+
+    steps = np.where(geom["kind"] == ARC, np.maximum(1, np.ceil(np.abs(geom["sweep"]) / arc_step)), 1).astype(np.intp)
+    owner = np.repeat(np.arange(len(geom)), steps)
+    first = np.cumsum(steps) - steps
+    # Fraction along each primitive for every sampled point (end points only;
+    # the start is the previous primitive's end)
+    t = (np.arange(len(owner)) - np.repeat(first, steps) + 1) / steps[owner]
+
+    g = geom[owner]
+    start_angle = np.arctan2(g["y0"] - g["cy"], g["x0"] - g["cx"])
+    angle = start_angle + np.radians(g["sweep"]) * t
+    is_arc = g["kind"] == ARC
+    xs = np.where(is_arc, g["cx"] + g["r"] * np.cos(angle), g["x0"] + (g["x1"] - g["x0"]) * t)
+    ys = np.where(is_arc, g["cy"] + g["r"] * np.sin(angle), g["y0"] + (g["y1"] - g["y0"]) * t)
+
+    points = np.empty((len(owner) + 1, 2), dtype=np.float64)
+    points[0] = geom["x0"][0], geom["y0"][0]
+    points[1:, 0] = xs
+    points[1:, 1] = ys
+    return points
+
+
+# Writes the primitive table as CSV (one row per line / arc)
+def geometry_to_csv(geom, output_csv):
+    header = ",".join(GEOMETRY_DTYPE.names)
+    table = np.column_stack([geom[name].astype(np.float64) for name in GEOMETRY_DTYPE.names])
+    np.savetxt(output_csv, table, delimiter=",", header=header, comments="", fmt="%.6g")
+
+
+# Draws the geometry onto an OpenCV image as a single polyline
+def draw_geometry_cv2(img, geom, color=(0, 0, 0), thickness=2, offset=(0, 0), arc_step=10.0):
+    import cv2
+
+    if len(geom) == 0:
+        return img
+    points = geometry_to_polyline(geom, arc_step)
+    points = np.rint(points + np.asarray(offset, dtype=np.float64)).astype(np.int32)
+    cv2.polylines(img, [points.reshape(-1, 1, 2)], False, color, thickness, cv2.LINE_AA)
+    return img
+
+
+# Bounding box of the sampled geometry as (min_x, min_y, max_x, max_y)
+def geometry_bounds(geom, arc_step=10.0):
+    points = geometry_to_polyline(geom, arc_step)
+    if len(points) == 0:
+        return (0.0, 0.0, 0.0, 0.0)
+    min_x, min_y = points.min(axis=0)
+    max_x, max_y = points.max(axis=0)
+    return (float(min_x), float(min_y), float(max_x), float(max_y))
+
+
+# Total stroke length of the geometry (lines plus arc lengths)
+def geometry_length(geom):
+    lengths = np.where(geom["kind"] == ARC, geom["r"] * np.radians(np.abs(geom["sweep"])), geom["r"])
+    return float(lengths.sum()) if len(geom) else 0.0
@@ -0,0 +1,65 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from kolam_geometry import ARC, geometry_to_polyline
+
+# Headless rasterizer for kolam geometry.
+#
+# Draws the lines and arcs from kolam_geometry straight into an in-memory PIL
+# buffer: no display, no Tk, no PostScript/Ghostscript round trip, so it runs
+# inside worker processes and scales across cores. Antialiasing comes from
+# drawing at supersample times the resolution and box-filtering down.
+
+
+# Centres of the loops drawn around the pulli (dots): arcs sweeping more than
+# half a turn
+def kolam_dots(geom):
+    loops = (geom["kind"] == ARC) & (np.abs(geom["sweep"]) > 180)
+    return np.column_stack([geom["cx"][loops], geom["cy"][loops]])
+
+
+# Maps geometry coordinates to pixels. With flip_y the geometry is treated as
+# y-up (turtle) coordinates around origin.
+def _to_pixels(points, origin, scale, flip_y, supersample):
+    x = origin[0] + points[:, 0] * scale
+    y = origin[1] - points[:, 1] * scale if flip_y else origin[1] + points[:, 1] * scale
+    return np.column_stack([x, y]) * supersample
+
+
+# Rasterizes geometry into a (height, width) uint8 array (0 = ink, 255 = paper
+# by default)
+def rasterize_geometry(geom, width=600, height=600, origin=(0, 0), scale=1.0, flip_y=False,
+                       stroke_width=2, color=0, background=255, dots=None, dot_radius=2,
+                       supersample=4, arc_step=5.0):
+    ss = max(1, int(supersample))
+    img = Image.new("L", (width * ss, height * ss), background)
+    draw = ImageDraw.Draw(img)
+
+    if len(geom):
+        points = _to_pixels(geometry_to_polyline(geom, arc_step), origin, scale, flip_y, ss)
+        line_width = max(1, int(round(stroke_width * scale * ss)))
+        # No joint="curve": it stamps a disc per vertex and is ~20x slower on
+        # big kolams, while arcs are sampled finely enough not to show gaps
+        draw.line(points.ravel().tolist(), fill=color, width=line_width)
+
+    if dots is not None and len(dots):
+        r = dot_radius * scale * ss
+        for x, y in _to_pixels(np.asarray(dots, dtype=np.float64), origin, scale, flip_y, ss).tolist():
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=color)
+
+    if ss > 1:
+        img = img.resize((width, height), Image.BOX)
+    return np.asarray(img)
+
+
+# PNG bytes for a rasterized array
+def encode_png(pixels):
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG", optimize=False)
+    return buffer.getvalue()
+
+
+def render_geometry_png(geom, **kwargs):
+    return encode_png(rasterize_geometry(geom, **kwargs))
@@ -1,6 +1,6 @@
-import turtle
-from PIL import Image
-import io
+from lsystem import expand_lsystem_string
+from kolam_geometry import lsystem_geometry
+from kolam_raster import kolam_dots, render_geometry_png
 
 # L-System parameters
 axiom = "FBFBFBFB"  # Initiator
@@ -10,13 +10,8 @@ rules = {
 }
 angle = 45  # Angle in degrees
 
-# Function to expand the L-System string
-def expand_lsystem_string(axiom, rules, iterations):
-    result = axiom
-    for _ in range(iterations):
-        result = "".join([rules.get(ch, ch) for ch in result])
-    return result
 
+# Turtle version of the renderer, for drawing interactively on a turtle screen
 def draw_suzhi_kolam(lsystem_string, dot_size, turtle_obj, screen_obj):
     turtle_obj.speed(0)  # Set the turtle's speed (0 is the fastest)
 
@@ -42,34 +37,22 @@ def draw_line(length, turtle_obj):
 def draw_arc(radius, angle, turtle_obj):
     turtle_obj.circle(radius, angle)
 
-def generate_kolam_image(axiom, rules, angle, dot_size, iterations):
-    screen = turtle.Screen()
-    screen.setup(width=600, height=600)
-    screen.tracer(0) # Turn off screen updates for faster drawing
-
-    t = turtle.Turtle()
-    t.hideturtle()
-
+# Renders the kolam to PNG bytes without a display. The geometry engine works
+# in the same y-up coordinates as the turtle version, starting at
+# (-dot_size, dot_size), and the rasterizer maps them onto a size x size image.
+def generate_kolam_image(axiom, rules, angle, dot_size, iterations, size=600, scale=1.0, draw_dots=False):
     lsystem_string = expand_lsystem_string(axiom, rules, iterations)
-    draw_suzhi_kolam(lsystem_string, dot_size, t, screen)
-
-    # Save to PostScript
-    ps_buffer = io.BytesIO()
-    screen.getcanvas().postscript(file=ps_buffer)
+    geom = lsystem_geometry(lsystem_string, dot_size, -dot_size, dot_size)
 
-    # Convert PostScript to PNG
-    ps_buffer.seek(0)
-    img = Image.open(ps_buffer)
-    
-    # Save PNG to a bytes buffer
-    png_buffer = io.BytesIO()
-    img.save(png_buffer, format="PNG")
-    png_buffer.seek(0)
-    
-    # Clean up turtle environment
-    # screen.bye()
-    
-    return png_buffer.getvalue()
+    return render_geometry_png(
+        geom,
+        width=size,
+        height=size,
+        origin=(size / 2, size / 2),
+        scale=scale,
+        flip_y=True,
+        dots=kolam_dots(geom) if draw_dots else None,
+    )
 
 if __name__ == '__main__':
     axiom = "FBFBFBFB"
@@ -1,56 +1,52 @@
 import cv2
 import numpy as np
-import pandas as pd
 
-# Load CSV data
+from camera_pipeline import FramePipeline
+from pixel_coords import load_coordinates
+from point_overlay import PointOverlay
+
+# Load point data (.csv, or .npy / .i32 which are memory-mapped, not parsed)
 csv_file = '/home/josva/kollamms turtle/latest-correct-code-colour-kolam-kolamsingleknot/output_coordinates.csv'  # Path to your CSV file
-data = pd.read_csv(csv_file)
+data = load_coordinates(csv_file)
 
-# Initialize video capture
-cap = cv2.VideoCapture(0)  # Change to the appropriate video source if needed
+# Video source: camera index, or a video file path to run without a camera
+video_source = 0  # Change to the appropriate video source if needed
 
 # Initialize circle parameters
 circle_radius = 10
 circle_thickness = 2
 circle_color = (0, 0, 255)  # Red color (BGR format)
 
+# All points drawn once into a layer that is pasted onto every frame
+overlay = PointOverlay(data, circle_radius, circle_color, circle_thickness)
+
 # Initialize current row index
 current_row = 0
 
-while True:
-    # Read frame from video stream
-    ret, frame = cap.read()
-    if not ret:
-        break
-    
-    # Get current X, Y coordinates from the CSV data
-    for x, y in data.values:
-        # Draw big red circle at the specified coordinates
-        cv2.circle(frame, (x, y), circle_radius, circle_color, circle_thickness)
-
-    # Show the frame
-    cv2.imshow('Video Stream', frame)
-    
-    # Wait for key press
-    key = cv2.waitKey(1) & 0xFF
-    
-    # Check if 'n' key is pressed to move the point
+
+def draw_frame(frame):
+    # Draw big red circles at all the coordinates from the CSV data
+    overlay.composite(frame)
+
+    # Draw the current point on top
+    if len(data):
+        current_x, current_y = (int(v) for v in data[current_row])
+        cv2.circle(frame, (current_x, current_y), circle_radius + 5, (255, 0, 0), -1)
+    return frame
+
+
+# Check if 'n' key is pressed to move the point
+def handle_key(key):
+    global current_row
     if key == ord('n'):
         # Increase current row index
         current_row += 1
-        
+
         # Reset current row index if it exceeds the number of rows in the CSV file
         if current_row >= len(data):
             current_row = 0
 
-    # Break the loop if 'q' key is pressed
-    if key == ord('q'):
-        break
-
-    # Resize the screen
-    cv2.resize(frame, (1280, 720))
-
-# Release video capture and close windows
-cap.release()
-cv2.destroyAllWindows()
 
+# Capture, draw and show on separate threads; 'q' quits
+pipeline = FramePipeline(video_source, draw_frame, on_key=handle_key)
+print(pipeline.run())
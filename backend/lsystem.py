@@ -0,0 +1,185 @@
+# L-System helpers shared by the API and the renderers.
+#
+# expand_lsystem_string builds the whole string like before. iter_lsystem and
+# iter_lsystem_chunks walk the expansion depth-first without building the
+# intermediate strings, and lsystem_symbol_counts / lsystem_length predict the
+# size of the final string from the rules alone, so oversized jobs can be
+# rejected before anything is expanded.
+
+# Function to expand the L-System string
+def expand_lsystem_string(axiom, rules, iterations):
+    result = axiom
+    for _ in range(iterations):
+        result = "".join([rules.get(ch, ch) for ch in result])
+    return result
+
+
+# Yields the symbols of the final string one by one, depth-first. Memory use is
+# O(iterations) instead of O(final length).
+def iter_lsystem(axiom, rules, iterations):
+    for chunk in iter_lsystem_chunks(axiom, rules, iterations):
+        yield from chunk
+
+
+# Yields the final string in pieces of roughly chunk_size symbols, depth-first.
+# Sub-expansions that fit in a chunk are memoized per (symbol, depth), so deep
+# systems are mostly stitched together from cached strings.
+def iter_lsystem_chunks(axiom, rules, iterations, chunk_size=65536):
+    lengths = _expansion_lengths(axiom, rules, iterations)
+    cache = {}
+
+    def expanded(symbol, depth):
+        key = (symbol, depth)
+        text = cache.get(key)
+        if text is None:
+            text = symbol
+            for _ in range(depth):
+                text = "".join([rules.get(ch, ch) for ch in text])
+            cache[key] = text
+        return text
+
+    pending = []
+    pending_size = 0
+    # Stack of (string, remaining depth) iterators, innermost last
+    stack = [(iter(axiom), iterations)]
+    while stack:
+        symbols, depth = stack[-1]
+        symbol = next(symbols, None)
+        if symbol is None:
+            stack.pop()
+            continue
+        if depth == 0 or symbol not in rules:
+            pending.append(symbol)
+            pending_size += 1
+        elif lengths[depth].get(symbol, 1) <= chunk_size:
+            text = expanded(symbol, depth)
+            pending.append(text)
+            pending_size += len(text)
+        else:
+            stack.append((iter(rules[symbol]), depth - 1))
+            continue
+        if pending_size >= chunk_size:
+            yield "".join(pending)
+            pending = []
+            pending_size = 0
+    if pending:
+        yield "".join(pending)
+
+
+# Per-symbol counts of the final string, computed from the rule matrix without
+# expanding anything. Returns a dict of symbol -> count. With a limit, stops at
+# the first depth whose string is longer than limit and returns its counts, so
+# a caller only checking the size never works through more than it accepts.
+def lsystem_symbol_counts(axiom, rules, iterations, limit=None):
+    counts = None
+    for _, counts in _counts_by_depth(axiom, rules, iterations, limit):
+        pass
+    return counts
+
+
+# Exact length of the final string, or a length over limit if the string (or
+# any string on the way to it) would be longer than limit
+def lsystem_length(axiom, rules, iterations, limit=None):
+    return sum(lsystem_symbol_counts(axiom, rules, iterations, limit).values())
+
+
+# Largest iteration count (<= iterations) whose final string has at most
+# max_length symbols, or -1 if even the axiom is too long
+def max_iterations_within(axiom, rules, iterations, max_length):
+    best = -1
+    for depth, counts in _counts_by_depth(axiom, rules, iterations, max_length):
+        if sum(counts.values()) > max_length:
+            break
+        best = depth
+    return best
+
+
+# Yields (depth, counts) for the strings on the way to the final one, stopping
+# after the first one longer than limit. Once none of the symbols left can
+# reach a rule that makes the string longer, every symbol just follows its own
+# chain of single-symbol rules, so the rest of the iterations are skipped and
+# the last item is the final depth; the same goes for a fixed point.
+def _counts_by_depth(axiom, rules, iterations, limit=None):
+    counts = _symbol_counts(axiom)
+    yield 0, counts
+    # Python ints keep the counts exact however large they get
+    productions = {symbol: _symbol_counts(replacement) for symbol, replacement in rules.items()}
+    growing = _growing_symbols(rules)
+    for depth in range(1, iterations + 1):
+        if growing.isdisjoint(counts):
+            final = {}
+            for symbol, count in counts.items():
+                symbol = _follow_rules(symbol, rules, iterations - depth + 1)
+                if symbol is not None:
+                    final[symbol] = final.get(symbol, 0) + count
+            yield iterations, final
+            return
+        next_counts = {}
+        for symbol, count in counts.items():
+            produced = productions.get(symbol)
+            if produced is None:
+                next_counts[symbol] = next_counts.get(symbol, 0) + count
+                continue
+            for child, child_count in produced.items():
+                next_counts[child] = next_counts.get(child, 0) + count * child_count
+        next_counts = {symbol: count for symbol, count in next_counts.items() if count}
+        if next_counts == counts:
+            # A fixed point, e.g. growth and erasure that cancel out
+            yield iterations, counts
+            return
+        counts = next_counts
+        yield depth, counts
+        if limit is not None and sum(counts.values()) > limit:
+            return
+
+
+# Symbols from which some rule producing more than one symbol can be reached
+def _growing_symbols(rules):
+    growing = {symbol for symbol, replacement in rules.items() if len(replacement) > 1}
+    while True:
+        reached = {symbol for symbol, replacement in rules.items()
+                   if symbol not in growing and not growing.isdisjoint(replacement)}
+        if not reached:
+            return growing
+        growing |= reached
+
+
+# What symbol becomes after steps rewrites by rules that each produce at most
+# one symbol, or None if it is erased on the way
+def _follow_rules(symbol, rules, steps):
+    path = [symbol]
+    seen = {symbol: 0}
+    while len(path) <= steps:
+        replacement = rules.get(path[-1], path[-1])
+        if not replacement:
+            return None
+        if replacement in seen:
+            # Went round a cycle; only the position in it matters
+            start = seen[replacement]
+            return path[start + (steps - start) % (len(path) - start)]
+        seen[replacement] = len(path)
+        path.append(replacement)
+    return path[steps]
+
+
+def _symbol_counts(text):
+    counts = {}
+    for ch in text:
+        counts[ch] = counts.get(ch, 0) + 1
+    return counts
+
+
+# lengths[d][symbol] is the length of symbol expanded d times
+def _expansion_lengths(axiom, rules, iterations):
+    alphabet = set(axiom)
+    for symbol, replacement in rules.items():
+        alphabet.add(symbol)
+        alphabet.update(replacement)
+    lengths = [{symbol: 1 for symbol in alphabet}]
+    for _ in range(iterations):
+        previous = lengths[-1]
+        lengths.append({
+            symbol: sum(previous[ch] for ch in rules[symbol]) if symbol in rules else 1
+            for symbol in alphabet
+        })
+    return lengths
@@ -0,0 +1,322 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from kolam_geometry import GEOMETRY_DTYPE, geometry_length, geometry_to_polyline, lsystem_geometry
+from lsystem import expand_lsystem_string
+
+# Per-symbol transform tables for deep L-Systems.
+#
+# Every occurrence of a symbol expanded to depth k draws the same thing relative
+# to where the turtle is and which way it faces. For each (symbol, depth) we
+# memoize:
+#   - the composed motion: end point (dx, dy) in the symbol's local frame, the
+#     heading change, the total stroke length and the primitive count,
+#   - the convex hull of the drawing in the local frame (only once bounds()
+#     asks for it),
+#   - the local segment list (a kolam_geometry array starting at the origin with
+#     heading 0), as long as it is not too big to keep around.
+# Geometry for high iteration counts is then stamped from cached sub-paths
+# straight into one preallocated array instead of re-interpreting every
+# character; sub-paths too big to cache are stamped from their children. Bounds
+# / length / end point come straight from the tables without emitting the path.
+#
+# Stamping costs a fixed overhead per piece, so it only beats the one-pass
+# vectorized expansion (kolam_geometry.lsystem_geometry) when pieces are big:
+# geometry() falls back to direct expansion when the axiom's symbols average
+# fewer than MIN_STAMP_PRIMITIVES primitives each, or when the system is
+# deeper than MAX_STAMP_DEPTH. Tables are built bottom-up, level by level, and
+# stamping walks them with an explicit stack, so depth never turns into
+# recursion. Tables are shared between requests in an LRU bounded by the total
+# number of cached primitives.
+
+# Sub-paths larger than this are stamped from their children instead of cached
+MAX_CACHED_PRIMITIVES = 100_000
+
+# Cached primitives kept per table and across all tables (about 73 bytes
+# each). Older tables are dropped when a table is fetched, so at most twice
+# this is held while the fetched table fills up.
+TABLE_CACHE_PRIMITIVES = 500_000
+
+# Average primitives per axiom symbol below which direct expansion is faster
+MIN_STAMP_PRIMITIVES = 256
+
+# A string this deep can only stay within the API's size limit if it grows
+# slowly, and then most levels are too small to share between and the cache
+# budget goes on single-primitive sub-paths; direct expansion is used instead
+MAX_STAMP_DEPTH = 32
+
+# Arc sampling step (degrees) used for hulls and bounding boxes
+HULL_ARC_STEP = 5.0
+
+
+def _rotation(heading):
+    angle = np.radians(heading)
+    return np.cos(angle), np.sin(angle)
+
+
+# Writes a local geometry array rotated by heading and moved to (x, y) into out
+def transform_geometry_into(out, geom, x, y, heading):
+    c, s = _rotation(heading)
+    out["kind"] = geom["kind"]
+    out["r"] = geom["r"]
+    out["sweep"] = geom["sweep"]
+    for px, py in (("x0", "y0"), ("x1", "y1"), ("cx", "cy")):
+        gx, gy = geom[px], geom[py]
+        out[px] = x + c * gx - s * gy
+        out[py] = y + s * gx + c * gy
+    out["heading"] = geom["heading"] + heading
+    return out
+
+
+# Returns a copy of a local geometry array rotated by heading and moved to (x, y)
+def transform_geometry(geom, x, y, heading):
+    return transform_geometry_into(np.empty(len(geom), dtype=GEOMETRY_DTYPE), geom, x, y, heading)
+
+
+def _transform_points(points, x, y, heading):
+    c, s = _rotation(heading)
+    return np.column_stack([x + c * points[:, 0] - s * points[:, 1],
+                            y + s * points[:, 0] + c * points[:, 1]])
+
+
+# Andrew's monotone chain; point sets here are small (a few dozen points)
+def _convex_hull(points):
+    points = np.unique(np.round(points, 9), axis=0)
+    if len(points) <= 2:
+        return points
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    pts = points.tolist()
+    lower = []
+    for p in pts:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in reversed(pts):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1], dtype=np.float64)
+
+
+class TransformTables:
+    def __init__(self, rules, dot_size, max_primitives=TABLE_CACHE_PRIMITIVES):
+        self.rules = dict(rules)
+        self.dot_size = dot_size
+        self.max_primitives = max_primitives
+        self.cached_primitives = 0
+        self._motions = {}
+        self._hulls = {}
+        self._segments = {}
+        # Deepest level filled in for every rule symbol, per table
+        self._filled = {"motions": 0, "hulls": 0}
+
+    # Fills table in for every rule symbol, one level at a time from the
+    # bottom up to depth, so deep systems never recurse once per level
+    def _fill(self, name, table, depth, combine):
+        for level in range(self._filled[name] + 1, depth + 1):
+            for symbol in self.rules:
+                table[(symbol, level)] = combine(symbol, level)
+            self._filled[name] = level
+
+    # (dx, dy, heading change, stroke length, primitive count) of symbol
+    # expanded depth times
+    def motion(self, symbol, depth):
+        if depth > 0 and symbol in self.rules:
+            if depth > self._filled["motions"]:
+                self._fill("motions", self._motions, depth, self._combine_motion)
+            return self._motions[(symbol, depth)]
+
+        entry = self._motions.get((symbol, 0))
+        if entry is None:
+            local = lsystem_geometry(symbol, self.dot_size)
+            if len(local):
+                dx, dy = float(local["x1"][-1]), float(local["y1"][-1])
+                turn = float(local["heading"][-1] + local["sweep"][-1])
+            else:
+                dx = dy = turn = 0.0
+            entry = self._motions[(symbol, 0)] = (dx, dy, turn, geometry_length(local), len(local))
+        return entry
+
+    def _combine_motion(self, symbol, depth):
+        x = y = heading = length = 0.0
+        count = 0
+        for child in self.rules[symbol]:
+            cdx, cdy, cturn, clength, ccount = self.motion(child, depth - 1)
+            c, s = _rotation(heading)
+            x, y = x + c * cdx - s * cdy, y + s * cdx + c * cdy
+            heading += cturn
+            length += clength
+            count += ccount
+        return x, y, heading, length, count
+
+    # Convex hull of symbol expanded depth times, in its local frame
+    def hull(self, symbol, depth):
+        if depth > 0 and symbol in self.rules:
+            if depth > self._filled["hulls"]:
+                self._fill("hulls", self._hulls, depth, self._combine_hull)
+            return self._hulls[(symbol, depth)]
+
+        hull = self._hulls.get((symbol, 0))
+        if hull is None:
+            local = lsystem_geometry(symbol, self.dot_size)
+            if len(local):
+                hull = _convex_hull(geometry_to_polyline(local, HULL_ARC_STEP))
+            else:
+                hull = np.zeros((1, 2), dtype=np.float64)
+            self._hulls[(symbol, 0)] = hull
+        return hull
+
+    def _combine_hull(self, symbol, depth):
+        x = y = heading = 0.0
+        hulls = []
+        for child in self.rules[symbol]:
+            hulls.append(_transform_points(self.hull(child, depth - 1), x, y, heading))
+            cdx, cdy, cturn = self.motion(child, depth - 1)[:3]
+            c, s = _rotation(heading)
+            x, y = x + c * cdx - s * cdy, y + s * cdx + c * cdy
+            heading += cturn
+        if not hulls:
+            return np.zeros((1, 2), dtype=np.float64)
+        return _convex_hull(np.concatenate(hulls))
+
+    # (dx, dy, heading change, stroke length, hull) of symbol expanded depth times
+    def transform(self, symbol, depth):
+        dx, dy, turn, length, _ = self.motion(symbol, depth)
+        return dx, dy, turn, length, self.hull(symbol, depth)
+
+    def _cacheable(self, symbol, depth):
+        count = self.motion(symbol, depth)[4]
+        return count <= MAX_CACHED_PRIMITIVES and self.cached_primitives + count <= self.max_primitives
+
+    # Local segment list of symbol expanded depth times, or None for an
+    # expanded symbol with more than MAX_CACHED_PRIMITIVES primitives or once
+    # the table's primitive budget is used up
+    def segments(self, symbol, depth):
+        if depth <= 0 or symbol not in self.rules:
+            depth = 0
+        geom = self._segments.get((symbol, depth))
+        if geom is not None:
+            return geom
+        if depth == 0:
+            return self._store_segments(symbol, 0, lsystem_geometry(symbol, self.dot_size))
+        if not self._cacheable(symbol, depth):
+            return None
+
+        # Children are built before their parents, with an explicit stack
+        # rather than one recursive call per level
+        stack = [(symbol, depth)]
+        while stack:
+            parent, level = stack[-1]
+            missing = [(child, level - 1) for child in dict.fromkeys(self.rules[parent])
+                       if level > 1 and child in self.rules and (child, level - 1) not in self._segments
+                       and self._cacheable(child, level - 1)]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            # A parent holds at least as many primitives as any child, so if it
+            # still fits, every child it needs is cached by now
+            if (parent, level) not in self._segments and self._cacheable(parent, level):
+                geom = np.empty(self.motion(parent, level)[4], dtype=GEOMETRY_DTYPE)
+                self._stamp_into(geom, 0, self.rules[parent], level - 1, 0.0, 0.0, 0.0)
+                self._store_segments(parent, level, geom)
+        return self._segments.get((symbol, depth))
+
+    def _store_segments(self, symbol, depth, geom):
+        geom.flags.writeable = False
+        self._segments[(symbol, depth)] = geom
+        self.cached_primitives += len(geom)
+        return geom
+
+    # Stamps symbols expanded depth times into out from index start, with the
+    # turtle at (x, y, heading); returns the index and pose after them.
+    # Symbols too big to cache are walked into with an explicit stack.
+    def _stamp_into(self, out, start, symbols, depth, x, y, heading):
+        stack = [(iter(symbols), depth)]
+        while stack:
+            symbols, depth = stack[-1]
+            symbol = next(symbols, None)
+            if symbol is None:
+                stack.pop()
+                continue
+            dx, dy, turn, _, count = self.motion(symbol, depth)
+            if count:
+                local = self.segments(symbol, depth)
+                if local is None:
+                    # Its children move the turtle on as they are stamped
+                    stack.append((iter(self.rules[symbol]), depth - 1))
+                    continue
+                transform_geometry_into(out[start:start + count], local, x, y, heading)
+                start += count
+            c, s = _rotation(heading)
+            x, y = x + c * dx - s * dy, y + s * dx + c * dy
+            heading += turn
+        return start, x, y, heading
+
+    # Full geometry of axiom expanded iterations times, starting at (start_x, start_y)
+    def geometry(self, axiom, iterations, start_x=0.0, start_y=0.0, start_heading=0.0):
+        total = 0 if iterations > MAX_STAMP_DEPTH else sum(self.motion(symbol, iterations)[4] for symbol in axiom)
+        if total < MIN_STAMP_PRIMITIVES * len(axiom):
+            return lsystem_geometry(expand_lsystem_string(axiom, self.rules, iterations), self.dot_size,
+                                    start_x, start_y, start_heading)
+        geom = np.empty(total, dtype=GEOMETRY_DTYPE)
+        self._stamp_into(geom, 0, axiom, iterations, start_x, start_y, start_heading)
+        return geom
+
+    def _walk(self, axiom, iterations, start_x, start_y, start_heading):
+        x, y, heading = start_x, start_y, start_heading
+        for symbol in axiom:
+            yield x, y, heading, self.hull(symbol, iterations)
+            dx, dy, turn = self.motion(symbol, iterations)[:3]
+            c, s = _rotation(heading)
+            x, y = x + c * dx - s * dy, y + s * dx + c * dy
+            heading += turn
+
+    # End point and final heading, without emitting the path
+    def endpoint(self, axiom, iterations, start_x=0.0, start_y=0.0, start_heading=0.0):
+        x, y, heading = start_x, start_y, start_heading
+        for symbol in axiom:
+            dx, dy, turn = self.motion(symbol, iterations)[:3]
+            c, s = _rotation(heading)
+            x, y = x + c * dx - s * dy, y + s * dx + c * dy
+            heading += turn
+        return float(x), float(y), float(heading)
+
+    # Total stroke length, without emitting the path
+    def length(self, axiom, iterations):
+        return float(sum(self.motion(symbol, iterations)[3] for symbol in axiom))
+
+    # Bounding box (min_x, min_y, max_x, max_y), without emitting the path
+    def bounds(self, axiom, iterations, start_x=0.0, start_y=0.0, start_heading=0.0):
+        hulls = [_transform_points(hull, x, y, heading)
+                 for x, y, heading, hull in self._walk(axiom, iterations, start_x, start_y, start_heading)]
+        if not hulls:
+            return (float(start_x), float(start_y), float(start_x), float(start_y))
+        points = np.concatenate(hulls)
+        min_x, min_y = points.min(axis=0)
+        max_x, max_y = points.max(axis=0)
+        return (float(min_x), float(min_y), float(max_x), float(max_y))
+
+
+# Tables are shared between requests that use the same rules and dot size,
+# least recently used first out once they hold more than TABLE_CACHE_PRIMITIVES
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+
+
+def get_transform_tables(rules, dot_size):
+    key = (tuple(sorted(rules.items())), dot_size)
+    with _tables_lock:
+        tables = _tables.get(key)
+        if tables is None:
+            tables = _tables[key] = TransformTables(key[0], dot_size)
+        _tables.move_to_end(key)
+        while len(_tables) > 1 and sum(t.cached_primitives for t in _tables.values()) > TABLE_CACHE_PRIMITIVES:
+            _tables.popitem(last=False)
+    return tables
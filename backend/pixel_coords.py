@@ -0,0 +1,218 @@
+import argparse
+import os
+
+import numpy as np
+
+from image_vectorize import skeletonize, trace_skeleton
+
+# Pixel coordinate extraction for black and white kolam images.
+#
+# Selects the pixels of one colour (or a grey-level range) and returns their
+# (x, y) coordinates as one int32 array, in the same row-by-row order the old
+# per-pixel loops produced, keeping only the first max_points. The scan is a
+# single np.flatnonzero over the flattened image instead of two Python loops,
+# so a 12 megapixel scan takes milliseconds.
+#
+# trace_coordinates is the ordered alternative to taking or sampling pixels:
+# the selected pixels are thinned and traced into strokes (the skeletonize and
+# trace stages of image_vectorize), the strokes are chained nearest end first,
+# and each is resampled at one uniform arc-length spacing chosen so the whole
+# drawing fits in max_points. Consecutive points then follow the drawing.
+#
+# Coordinates are saved in one shot in a format picked by the file extension:
+# CSV (.csv), NumPy (.npy), raw little-endian int32 x, y pairs (.i32/.bin/.raw)
+# or Parquet (.parquet, needs pyarrow). load_coordinates memory-maps the .npy
+# and raw formats, so trackers can use a large point file without parsing it.
+#
+# Usable as a library or from the command line:
+#   python pixel_coords.py binary_image.png --color black -o output.csv
+#   python pixel_coords.py scan.png --range 0 60 --max-points 0 -o dark.csv
+#   python pixel_coords.py binary_image.png --color white -o points.npy
+#   python pixel_coords.py binary_image.png --color white --trace --max-points 2000
+
+MAX_POINTS = 100000
+
+COLOR_LEVELS = {"white": 255, "black": 0}
+
+RAW_EXTENSIONS = (".i32", ".bin", ".raw")
+RAW_DTYPE = np.dtype("<i4")
+
+
+def load_grayscale(image_path):
+    import cv2
+
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise FileNotFoundError(f"Could not read image '{image_path}'")
+    return image
+
+
+# Mask of the selected pixels: exactly white (255), exactly black (0), or any
+# grey level in low..high (inclusive) when a range is given
+def select_pixels(image, color="black", low=None, high=None):
+    if low is not None or high is not None:
+        low = 0 if low is None else low
+        high = 255 if high is None else high
+        return (image >= low) & (image <= high)
+    if color not in COLOR_LEVELS:
+        raise ValueError(f"Invalid color choice '{color}'. Please choose 'white' or 'black'.")
+    return image == COLOR_LEVELS[color]
+
+
+# (x, y) coordinates of the selected pixels as an (n, 2) int32 array, scanning
+# row by row and stopping after max_points (0 or None for no limit). image may
+# be a grayscale array or a path to an image file.
+def extract_coordinates(image, color="black", low=None, high=None, max_points=MAX_POINTS):
+    if isinstance(image, str):
+        image = load_grayscale(image)
+    indices = np.flatnonzero(select_pixels(image, color, low, high))
+    if max_points:
+        indices = indices[:max_points]
+    y, x = np.divmod(indices, image.shape[1])
+    return np.column_stack([x, y]).astype(np.int32)
+
+
+# Strokes reordered (and reversed where needed) so each one starts at the
+# free stroke end nearest to where the previous one finished, beginning at the
+# top-left-most stroke start
+def order_strokes(strokes):
+    if not strokes:
+        return []
+    starts = np.array([stroke[0] for stroke in strokes])
+    ends = np.array([stroke[-1] for stroke in strokes])
+    free = np.ones(len(strokes), dtype=bool)
+    position = starts[np.lexsort((starts[:, 0], starts[:, 1]))[0]]
+    ordered = []
+    for _ in range(len(strokes)):
+        to_start = np.where(free, np.hypot(*(starts - position).T), np.inf)
+        to_end = np.where(free, np.hypot(*(ends - position).T), np.inf)
+        nearest = int(np.argmin(np.minimum(to_start, to_end)))
+        stroke = strokes[nearest] if to_start[nearest] <= to_end[nearest] else strokes[nearest][::-1]
+        free[nearest] = False
+        ordered.append(stroke)
+        position = stroke[-1]
+    return ordered
+
+
+def _arc_lengths(stroke):
+    return np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(stroke, axis=0).T))])
+
+
+# Ordered strokes resampled at one uniform arc-length spacing (at least a
+# pixel) into a single (n, 2) int32 array with n <= max_points. Every stroke
+# keeps both ends; when there are too many strokes for that, the shortest are
+# dropped. A budget of 2 or 3 still keeps the longest stroke's two ends.
+def resample_strokes(strokes, max_points):
+    arcs = [_arc_lengths(stroke) for stroke in strokes]
+    lengths = np.array([arc[-1] for arc in arcs])
+    keep = np.ones(len(strokes), dtype=bool)
+    if 2 * len(strokes) >= max_points:
+        keep[:] = False
+        kept = (max_points - 1) // 2 if max_points >= 4 else max_points // 2
+        keep[np.argsort(-lengths, kind="stable")[:kept]] = True
+    if not keep.any() or lengths[keep].sum() == 0:
+        return np.empty((0, 2), dtype=np.int32)
+
+    # floor(length / spacing) + 2 points per stroke at most, so this spacing
+    # keeps the total within max_points; with no points to spare past the
+    # ends, every stroke gets just its two ends
+    spare = max_points - 2 * keep.sum()
+    spacing = max(1.0, lengths[keep].sum() / spare) if spare > 0 else np.inf
+    points = []
+    for i in np.flatnonzero(keep):
+        stroke, arc = strokes[i], arcs[i]
+        at = np.linspace(0.0, lengths[i], max(2, int(lengths[i] // spacing) + 1))
+        points.append(np.column_stack([np.interp(at, arc, stroke[:, 0]), np.interp(at, arc, stroke[:, 1])]))
+    return np.rint(np.concatenate(points)).astype(np.int32)
+
+
+# Selected pixels traced into strokes in drawing order, resampled to at most
+# max_points (x, y) points. image may be a grayscale array or a path.
+def trace_coordinates(image, color="black", low=None, high=None, max_points=MAX_POINTS, executor=None):
+    if isinstance(image, str):
+        image = load_grayscale(image)
+    context = {"executor": executor}
+    strokes = trace_skeleton(skeletonize(select_pixels(image, color, low, high), context), context)
+    return resample_strokes(order_strokes(strokes), max_points)
+
+
+def _extension(path):
+    return os.path.splitext(str(path))[1].lower()
+
+
+# CSV text for an (n, 2) point array, formatted in a single % operation;
+# header=None leaves out the header row
+def format_csv(points, header=("x", "y")):
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    rows = ("%d,%d\n" * len(points)) % tuple(points.ravel().tolist())
+    return rows if header is None else ",".join(header) + "\n" + rows
+
+
+# Writes an (n, 2) point array to path in the format given by its extension
+def save_coordinates(points, path, header=("x", "y")):
+    points = np.asarray(points).reshape(-1, 2)
+    extension = _extension(path)
+    if extension == ".npy":
+        np.save(path, points.astype(np.int32))
+    elif extension in RAW_EXTENSIONS:
+        points.astype(RAW_DTYPE).tofile(path)
+    elif extension == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = [pa.array(points[:, i].astype(np.int32)) for i in range(2)]
+        pq.write_table(pa.table(columns, names=[name.lower() for name in header]), path)
+    else:
+        with open(path, "w", newline="") as csvfile:
+            csvfile.write(format_csv(points, header))
+
+
+# (n, 2) int32 point array from a file written by save_coordinates (or any
+# two-column CSV with a header row). The .npy and raw formats are memory-mapped
+# read-only rather than read in; pass mmap=False to load them into memory.
+def load_coordinates(path, mmap=True):
+    extension = _extension(path)
+    if extension == ".npy":
+        return np.load(path, mmap_mode="r" if mmap else None)
+    if extension in RAW_EXTENSIONS:
+        if mmap:
+            if os.path.getsize(path) == 0:
+                return np.empty((0, 2), dtype=RAW_DTYPE)
+            return np.memmap(path, dtype=RAW_DTYPE, mode="r").reshape(-1, 2)
+        return np.fromfile(path, dtype=RAW_DTYPE).reshape(-1, 2)
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        return np.column_stack([table.column(i).to_numpy() for i in range(2)]).astype(np.int32)
+    return np.loadtxt(path, dtype=np.int32, delimiter=",", skiprows=1, ndmin=2)
+
+
+def export_to_csv(points, output_path):
+    save_coordinates(points, output_path, header=("X", "Y"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract pixel coordinates from a black and white image")
+    parser.add_argument("image", help="input image")
+    parser.add_argument("--color", choices=sorted(COLOR_LEVELS), default="black", help="pixel colour to extract")
+    parser.add_argument("--range", nargs=2, type=int, metavar=("LOW", "HIGH"),
+                        help="extract grey levels LOW..HIGH instead of one colour")
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS, help="keep only the first N points (0 for all)")
+    parser.add_argument("--trace", action="store_true",
+                        help="trace strokes in drawing order and resample them to --max-points")
+    parser.add_argument("-o", "--output", default="output.csv",
+                        help="output file: .csv, .npy, .i32/.bin/.raw (raw int32) or .parquet")
+    args = parser.parse_args(argv)
+
+    low, high = args.range if args.range else (None, None)
+    if args.trace:
+        points = trace_coordinates(args.image, args.color, low, high, args.max_points or MAX_POINTS)
+    else:
+        points = extract_coordinates(args.image, args.color, low, high, args.max_points)
+    save_coordinates(points, args.output, header=("X", "Y"))
+    print(f"Extracted {len(points)} coordinates and exported to '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import cv2
+import numpy as np
+
+from kolam_geometry import draw_geometry_cv2
+from kolam_raster import kolam_dots
+
+# Static overlays for the live camera scripts.
+#
+# Drawing every kolam point or L-System stroke with cv2 calls on every captured
+# frame costs thousands of calls per frame. The drawing does not change, so it
+# is drawn once into a mask the size of the frame (cached per frame size) and
+# each frame gets it in one vectorized step: a masked copy when every drawn
+# pixel is opaque, otherwise an alpha blend, limited to the rows and columns
+# the drawing covers. Only moving markers are still drawn per frame.
+#
+# Subclasses of MaskOverlay draw their shapes in 255 on a single-channel mask;
+# the overlay colour and alpha are applied when the layer is built.
+
+
+class MaskOverlay:
+    def __init__(self, color=(0, 0, 255), alpha=1.0):
+        self.color = color
+        self.alpha = alpha
+        self._layers = {}
+
+    # Draws the shapes onto a zeroed (height, width) uint8 mask in 255
+    def draw_mask(self, mask):
+        raise NotImplementedError
+
+    # (layer, blend data) for frames of the given shape, drawn on first use
+    def _entry(self, shape):
+        shape = tuple(shape[:2])
+        if shape not in self._layers:
+            self._layers[shape] = self._rasterize(shape)
+        return self._layers[shape]
+
+    # BGRA layer with the shapes drawn, for frames of the given (height, width)
+    def layer(self, shape):
+        return self._entry(shape)[0]
+
+    def _rasterize(self, shape):
+        mask = np.zeros(shape, dtype=np.uint8)
+        self.draw_mask(mask)
+        layer = np.zeros((*shape, 4), dtype=np.uint8)
+        layer[:, :, :3] = self.color
+        layer[:, :, 3] = (mask.astype(np.uint16) * int(round(255 * self.alpha)) + 127) // 255
+
+        # Bounding box of the drawn pixels and what composite needs for it
+        rows, cols = np.flatnonzero(layer[:, :, 3].any(axis=1)), np.flatnonzero(layer[:, :, 3].any(axis=0))
+        if len(rows) == 0:
+            return layer, None
+        box = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+        part = layer[box]
+        alpha = part[:, :, 3:]
+        if np.isin(alpha, (0, 255)).all():
+            blend = (alpha[:, :, 0].copy(), part[:, :, :3].copy())
+        else:
+            # Premultiplied colour and inverse alpha, so blending is one
+            # multiply-add per pixel
+            weight = alpha.astype(np.uint16)
+            blend = (255 - weight, part[:, :, :3] * weight)
+        return layer, (box, blend)
+
+    # Draws the overlay onto a BGR frame in place and returns it
+    def composite(self, frame):
+        prepared = self._entry(frame.shape)[1]
+        if prepared is None:
+            return frame
+        box, (first, second) = prepared
+        target = frame[box]
+        if first.dtype == np.uint8:
+            # cv2.copyTo writes through the view and is far faster than
+            # np.copyto with a broadcast mask
+            cv2.copyTo(second, first, target)
+        else:
+            target[:] = (target * first + second + 127) // 255
+        return frame
+
+
+# A fixed set of (x, y) points, each drawn as a circle
+class PointOverlay(MaskOverlay):
+    def __init__(self, points, radius=10, color=(0, 0, 255), thickness=2, alpha=1.0, offset=(0, 0)):
+        super().__init__(color, alpha)
+        self.points = np.asarray(points, dtype=np.int64).reshape(-1, 2) + np.asarray(offset, dtype=np.int64)
+        self.radius = radius
+        self.thickness = thickness
+
+    def draw_mask(self, mask):
+        for x, y in self.points.tolist():
+            cv2.circle(mask, (x, y), self.radius, 255, self.thickness)
+
+
+# Kolam geometry (see kolam_geometry) drawn as one polyline starting at the
+# centre of the frame, with a filled dot inside every loop when dot_radius is
+# set
+class KolamOverlay(MaskOverlay):
+    def __init__(self, geom, thickness=2, dot_radius=0, color=(0, 0, 0), alpha=1.0, arc_step=10.0):
+        super().__init__(color, alpha)
+        self.geom = geom
+        self.thickness = thickness
+        self.dot_radius = dot_radius
+        self.arc_step = arc_step
+
+    def draw_mask(self, mask):
+        centre = (mask.shape[1] // 2, mask.shape[0] // 2)
+        draw_geometry_cv2(mask, self.geom, 255, self.thickness, centre, self.arc_step)
+        if self.dot_radius:
+            dots = np.rint(kolam_dots(self.geom) + centre).astype(np.int64)
+            for x, y in dots.tolist():
+                cv2.circle(mask, (x, y), self.dot_radius, 255, -1)
@@ -0,0 +1,182 @@
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+
+# Long-lived pool of renderer processes for the Flask app.
+#
+# Each worker is a separate process fed over its own pipe, so a job that runs
+# past its timeout can be killed without touching the other workers. Workers
+# are recycled after max_jobs_per_worker jobs to keep leaked state and memory
+# in check, and replaced straight away if they die or time out.
+
+
+class PoolBusyError(Exception):
+    pass
+
+
+class RenderTimeoutError(Exception):
+    pass
+
+
+class RenderError(Exception):
+    def __init__(self, message, worker_traceback):
+        super().__init__(message)
+        self.worker_traceback = worker_traceback
+
+
+# Worker process loop: run the initializer once, then serve (fn, args) jobs
+# until told to stop with None
+def _worker_main(conn, initializer):
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        fn, args = job
+        try:
+            conn.send(("ok", fn(*args)))
+        except Exception as e:
+            conn.send(("error", str(e), traceback.format_exc()))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, context, initializer):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, initializer), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+        self.started_at = time.time()
+        self.busy_since = None
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+    def status(self):
+        return {
+            "pid": self.process.pid,
+            "alive": self.process.is_alive(),
+            "jobs_done": self.jobs_done,
+            "uptime": round(time.time() - self.started_at, 1),
+            "busy_for": round(time.time() - self.busy_since, 1) if self.busy_since else None,
+        }
+
+
+class RendererPool:
+    def __init__(self, size=2, max_jobs_per_worker=100, timeout=30.0, initializer=None):
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.timeout = timeout
+        self.initializer = initializer
+        self._context = multiprocessing.get_context()
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._workers = []
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.recycled = 0
+        for _ in range(size):
+            self._add_worker()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _add_worker(self):
+        worker = _Worker(self._context, self.initializer)
+        with self._lock:
+            self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _retire(self, worker, kill=False):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        self._add_worker()
+
+    # Runs fn(*args) in a worker and returns its result. Raises PoolBusyError if
+    # no worker frees up within the timeout, RenderTimeoutError if the job runs
+    # too long (the worker is killed and replaced) and RenderError if it fails.
+    def run(self, fn, *args, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolBusyError(f"All {self.size} renderer workers are busy")
+
+        if not worker.process.is_alive():
+            self._retire(worker, kill=True)
+            return self.run(fn, *args, timeout=timeout)
+
+        worker.busy_since = time.time()
+        try:
+            worker.conn.send((fn, args))
+            if not worker.conn.poll(timeout):
+                self._count("timed_out")
+                self._retire(worker, kill=True)
+                raise RenderTimeoutError(f"Kolam generation timed out after {timeout} seconds")
+            result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self._count("failed")
+            self._retire(worker, kill=True)
+            raise RenderError(f"Renderer worker died: {e}", traceback.format_exc())
+        worker.busy_since = None
+        worker.jobs_done += 1
+
+        if worker.jobs_done >= self.max_jobs_per_worker:
+            self._count("recycled")
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+        if result[0] == "error":
+            self._count("failed")
+            raise RenderError(result[1], result[2])
+        self._count("completed")
+        return result[1]
+
+    def status(self):
+        with self._lock:
+            workers = [worker.status() for worker in self._workers]
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "healthy": sum(1 for worker in workers if worker["alive"]),
+            "max_jobs_per_worker": self.max_jobs_per_worker,
+            "timeout": self.timeout,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "recycled": self.recycled,
+            "workers": workers,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers = []
+        for worker in workers:
+            worker.stop()
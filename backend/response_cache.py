@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Content-addressed cache for rendered responses.
+#
+# Keys are SHA-256 hashes of the canonical JSON form of the request parameters,
+# so the same key always means the same bytes and can double as a strong ETag.
+# Entries live in an in-process LRU bounded by total byte size, with an
+# optional on-disk tier (one file per key) that survives restarts. get and put
+# are coroutines: memory hits are answered directly and disk reads and writes
+# run in a worker thread, off the event loop.
+
+
+# Canonical hash of a JSON-serializable parameter dict. Keys are sorted and
+# whitespace is fixed so equal parameters always hash the same.
+def canonical_key(data, version=""):
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = hashlib.sha256()
+    digest.update(version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(payload.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def etag_for_key(key):
+    return f'"{key}"'
+
+
+# True if an If-None-Match header value matches the given ETag
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._disk_size = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_size = sum(size for _, size, _ in self._disk_files())
+
+    async def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = await asyncio.to_thread(self._read_disk, key) if self.disk_dir else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+        return value
+
+    async def put(self, key, value):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        with self._lock:
+            self._store(key, value)
+        if self.disk_dir and len(value) <= self.max_disk_bytes:
+            await asyncio.to_thread(self._write_disk, key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_dir": self.disk_dir,
+            }
+
+    # Empties both tiers
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if not self.disk_dir:
+            return
+        for _, _, path in self._disk_files():
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+        with self._lock:
+            self._disk_size = sum(size for _, size, _ in self._disk_files())
+
+    # Caller holds the lock
+    def _store(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir or len(value) > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            # An overwritten file's size comes off the total
+            try:
+                replaced = os.stat(path).st_size
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_size += len(value) - replaced
+            over_budget = self._disk_size > self.max_disk_bytes
+        if over_budget:
+            self._prune_disk()
+
+    def _disk_files(self):
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    # Drops the oldest files until the disk tier is back under budget
+    def _prune_disk(self):
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._disk_size = total
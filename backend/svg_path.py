@@ -0,0 +1,34 @@
+import numpy as np
+
+# Shortest text for a number that has already been rounded: "10" instead of
+# "10.0", "3.54" instead of "3.5400", and never "-0".
+def format_number(value):
+    text = repr(float(value) + 0.0)
+    if text.endswith(".0"):
+        text = text[:-2]
+    return text
+
+
+# Builds a single SVG path "d" string for a whole connected stroke at once.
+# Every stroke after the first is written as a relative command ("l" / "a"),
+# so thousands of lines and arcs end up in one <path> element instead of one
+# svgwrite element per symbol. Offsets are taken between rounded points, so
+# rounding errors never add up.
+# ends is an (N, 2) array of absolute end points; is_arc, radii, large_arc and
+# sweep describe each command (radii / flags are ignored for lines).
+# With move_to=False the leading "M" is left out, so a long path can be written
+# in pieces that continue from the previous piece's last point.
+def relative_path_data(start_x, start_y, ends, is_arc, radii, large_arc, sweep, precision=2, move_to=True):
+    start = np.round([[start_x, start_y]], precision)
+    points = np.round(np.concatenate([start, ends]), precision)
+    deltas = np.round(np.diff(points, axis=0), precision).tolist()
+    radii = np.round(radii, precision).tolist()
+
+    parts = [f"M{format_number(points[0, 0])},{format_number(points[0, 1])}"] if move_to else []
+    for (dx, dy), arc, r, large, sw in zip(deltas, is_arc.tolist(), radii, large_arc.tolist(), sweep.tolist()):
+        if arc:
+            r = format_number(r)
+            parts.append(f"a{r},{r} 0 {large:d} {sw:d} {format_number(dx)},{format_number(dy)}")
+        else:
+            parts.append(f"l{format_number(dx)},{format_number(dy)}")
+    return " ".join(parts)
@@ -1,80 +1,87 @@
+from functools import lru_cache
+
 import cv2
-import matplotlib.pyplot as plt
-import matplotlib.tri as tri
-import matplotlib.transforms as transforms
 import numpy as np
-import time
-
-def draw_rangoli(frame):
-    n_angles = 36
-    n_radii = 8
-    min_radius = 0.25
-    radii = np.linspace(min_radius, 0.95, n_radii)
-
-    angles = np.linspace(0, 2 * np.pi, n_angles, endpoint=False)
-    angles = np.repeat(angles[..., np.newaxis], n_radii, axis=1)
-    angles[:, 1::2] += np.pi / n_angles
-
-    x = (radii * np.cos(angles)).flatten()
-    y = (radii * np.sin(angles)).flatten()
-
-    triang = tri.Triangulation(x, y)
-
-    triang.set_mask(np.hypot(x[triang.triangles].mean(axis=1),
-                             y[triang.triangles].mean(axis=1))
-                    < min_radius)
 
-    fig, ax = plt.subplots()
-    ax.set_aspect('equal')
-    ax.triplot(triang, 'b-', lw=1)
-    ax.set_title('Symmetry-Preserving Rangoli')
-    ax.axis(False)
+from camera_pipeline import FramePipeline
 
-    # Plotting symmetry-preserving rangoli
-    ax.triplot(triang, 'b-', lw=1)
-    
-    # Apply rotation transformation for symmetry
-    rotation = transforms.Affine2D().rotate_deg(120)
-    ax.triplot(triang, 'r-', lw=1, transform=rotation + ax.transData)
+# Rangoli pattern: points on n_radii rings of n_angles points each, every other
+# ring turned by half a step, triangulated ring to ring
+n_angles = 36
+n_radii = 8
+min_radius = 0.25
+max_radius = 0.95
 
-    rotation = transforms.Affine2D().rotate_deg(240)
-    ax.triplot(triang, 'g-', lw=1, transform=rotation + ax.transData)
+# Share of the smaller frame side the outer ring spans
+rangoli_scale = 0.75
 
-    # Convert the plot to an image
-    fig.canvas.draw()
-    img = np.array(fig.canvas.renderer.buffer_rgba())
+# Line colours (BGR) of the plain and the 120 and 240 degree rotated copies
+layer_colors = ((255, 0, 0), (0, 0, 255), (0, 128, 0))
 
-    # Resize the image to match the webcam frame size
-    img = cv2.resize(img, (frame.shape[1], frame.shape[0]))
 
-    # Merge the plot image with the webcam frame
-    result = cv2.addWeighted(frame, 0.7, img, 0.3, 0)
-
-    # Display the result
-    cv2.imshow('Rangoli', result)
-    cv2.waitKey(1)
-
-# Open the webcam
-cap = cv2.VideoCapture(0)
-
-while True:
-    # Read a frame from the webcam
-    ret, frame = cap.read()
-
-    if not ret:
-        break
-
-    # Draw the rangoli on the frame
-    draw_rangoli(frame)
-
-    # Wait for 0.5 seconds
-    time.sleep(0.5)
+# Ring points as (n_angles * n_radii, 2) and the triangulation's edges as index
+# pairs. On staggered rings the Delaunay triangles are the zigzag between each
+# pair of neighbouring rings, so the edges are every ring segment plus, from
+# each point, the two nearest points on the next ring out; the triangles inside
+# the inner ring are left out.
+@lru_cache(maxsize=1)
+def rangoli_edges():
+    radii = np.linspace(min_radius, max_radius, n_radii)
+    angles = np.linspace(0, 2 * np.pi, n_angles, endpoint=False)
+    angles = np.repeat(angles[..., np.newaxis], n_radii, axis=1)
+    angles[:, 1::2] += np.pi / n_angles
+    points = np.stack([(radii * np.cos(angles)).ravel(), (radii * np.sin(angles)).ravel()], axis=1)
+
+    i = np.arange(n_angles)[:, np.newaxis]
+    j = np.arange(n_radii)[np.newaxis, :]
+
+    def index(i, j):
+        return (i % n_angles) * n_radii + j
+
+    inner = j[:, :-1]
+    # Outward neighbours of an even ring's point i are i and i - 1 on the next
+    # ring; an odd ring's point i sits half a step further round, between i and i + 1
+    shift = np.where(inner % 2 == 0, -1, 1)
+    edges = np.concatenate([
+        np.stack(np.broadcast_arrays(index(i, j), index(i + 1, j)), axis=-1).reshape(-1, 2),
+        np.stack(np.broadcast_arrays(index(i, inner), index(i, inner + 1)), axis=-1).reshape(-1, 2),
+        np.stack(np.broadcast_arrays(index(i, inner), index(i + shift, inner + 1)), axis=-1).reshape(-1, 2),
+    ])
+    return points, edges
+
+
+# The rangoli on white, with its rotated copies, as a (height, width) BGR image
+@lru_cache(maxsize=4)
+def rangoli_layer(width, height):
+    points, edges = rangoli_edges()
+    layer = np.full((height, width, 3), 255, dtype=np.uint8)
+    scale = rangoli_scale * min(width, height) / 2 / max_radius
+    centre = np.array([width / 2, height / 2])
+    for degrees, color in zip((0, 120, 240), layer_colors):
+        theta = np.radians(degrees)
+        rotation = np.array([[np.cos(theta), np.sin(theta)], [-np.sin(theta), np.cos(theta)]])
+        # y up, like the plot this replaces
+        pixels = (points @ rotation) * [scale, -scale] + centre
+        segments = np.rint(pixels[edges]).astype(np.int32)
+        cv2.polylines(layer, list(segments), False, color, 1, cv2.LINE_AA)
+
+    title = 'Symmetry-Preserving Rangoli'
+    (text_width, text_height), _ = cv2.getTextSize(title, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+    cv2.putText(layer, title, ((width - text_width) // 2, text_height + 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6,
+                (0, 0, 0), 1, cv2.LINE_AA)
+    layer.flags.writeable = False
+    return layer
+
+
+# Blends the rangoli (drawn once per frame size) with the webcam frame
+def draw_rangoli(frame):
+    layer = rangoli_layer(frame.shape[1], frame.shape[0])
+    return cv2.addWeighted(frame, 0.7, layer, 0.3, 0)
 
-    # Break the loop if 'q' is pressed
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
-# Release the webcam and close all windows
-cap.release()
-cv2.destroyAllWindows()
+# Video source: camera index, or a video file path to run without a camera
+video_source = 0
 
+# Capture, draw and show on separate threads; 'q' quits
+pipeline = FramePipeline(video_source, draw_rangoli, window='Rangoli')
+print(pipeline.run())
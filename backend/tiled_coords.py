@@ -0,0 +1,216 @@
+import argparse
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pixel_coords import (COLOR_LEVELS, MAX_POINTS, RAW_DTYPE, RAW_EXTENSIONS, _extension, format_csv,
+                          load_grayscale, select_pixels)
+
+# Coordinate extraction for scans too big to threshold in memory.
+#
+# A 20k x 20k floor kolam is 400 MB as one grayscale plane, but the boolean
+# masks and int64 np.where indices built from it run to gigabytes. Here the
+# image is processed in strips of rows instead, in two passes: the first counts
+# the selected pixels of every strip, which fixes the size of the output and
+# where each strip's points go in it; the second thresholds each strip again
+# and writes its points straight into its slice of a memory-mapped .npy or raw
+# int32 file (CSV output is appended strip by strip). Only a few strips are in
+# flight at a time, so strips can go to a process pool.
+#
+# Sources ending in .npy or .pgm (8-bit binary PGM) are memory-mapped and every
+# worker maps just its own strip. Other formats have no strip access through
+# cv2, so they are decoded once with cv2.imread and strips are sliced from that
+# single uint8 plane. Either way the points match the in-memory path
+# (cv2.threshold, then pixel_coords.extract_coordinates) exactly.
+#
+#   python tiled_coords.py scan.pgm --threshold 127 --color white -o points.i32 --workers 8
+
+STRIP_ROWS = 1024
+
+# Strips handed to the executor per map call
+STRIP_BATCH = 16
+
+MAPPABLE_EXTENSIONS = (".npy", ".pgm", ".pnm")
+
+# Output formats that can be written strip by strip
+OUTPUT_EXTENSIONS = (".npy", ".csv") + RAW_EXTENSIONS
+
+_PGM_FIELD = re.compile(rb"(?:\s|#[^\n]*\n)*(\S+)")
+
+
+# Offset of the pixel data and (height, width) of an 8-bit binary PGM
+def _pgm_header(path):
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    fields, position = [], 0
+    for _ in range(4):
+        match = _PGM_FIELD.match(head, position)
+        if match is None:
+            raise ValueError(f"'{path}' is not a binary PGM image")
+        fields.append(match.group(1))
+        position = match.end()
+    magic, width, height, maxval = fields
+    if magic != b"P5" or int(maxval) > 255:
+        raise ValueError(f"Only 8-bit binary PGM (P5) images can be memory-mapped, not '{path}'")
+    # A single whitespace character separates the header from the pixels
+    return position + 1, (int(height), int(width))
+
+
+# Grayscale image for path, memory-mapped read-only where the format allows it
+def open_grayscale(path):
+    extension = _extension(path)
+    if extension == ".npy":
+        image = np.load(path, mmap_mode="r")
+        if image.ndim != 2 or image.dtype != np.uint8:
+            raise ValueError(f"'{path}' is not a 2D uint8 image array")
+        return image
+    if extension in (".pgm", ".pnm"):
+        offset, shape = _pgm_header(path)
+        return np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=shape)
+    return load_grayscale(path)
+
+
+# Same as cv2.threshold(image, threshold, 255, THRESH_BINARY or
+# THRESH_BINARY_INV) on uint8 pixels
+def threshold_image(image, threshold, invert=False):
+    above = image > threshold
+    return np.where(above != invert, np.uint8(255), np.uint8(0))
+
+
+def _strip_mask(strip, options):
+    color, low, high, threshold, invert = options
+    if threshold is not None:
+        strip = threshold_image(strip, threshold, invert)
+    return select_pixels(strip, color, low, high)
+
+
+# A job's source is a mappable path, opened by the worker, or the strip itself
+def _load_strip(source, y0, y1):
+    if isinstance(source, str):
+        return np.asarray(open_grayscale(source)[y0:y1])
+    return source
+
+
+def _count_strip(job):
+    source, y0, y1, options = job
+    return int(np.count_nonzero(_strip_mask(_load_strip(source, y0, y1), options)))
+
+
+# Points of the strip, first count of them; written into output at start when
+# output is a .npy or raw file, otherwise returned
+def _write_strip(job):
+    source, y0, y1, options, output, start, count = job
+    if count == 0:
+        return None if output else np.empty((0, 2), dtype=np.int32)
+    strip = _load_strip(source, y0, y1)
+    indices = np.flatnonzero(_strip_mask(strip, options))[:count]
+    y, x = np.divmod(indices, strip.shape[1])
+    points = np.column_stack([x, y + y0]).astype(np.int32)
+    if output is None:
+        return points
+    if _extension(output) == ".npy":
+        target = np.load(output, mmap_mode="r+")[start:start + count]
+    else:
+        target = np.memmap(output, dtype=RAW_DTYPE, mode="r+", offset=start * 8, shape=(count, 2))
+    target[:] = points
+    target.flush()
+    return None
+
+
+def _map_batched(executor, fn, jobs):
+    if executor is None:
+        yield from map(fn, jobs)
+        return
+    jobs = iter(jobs)
+    while True:
+        batch = list(itertools.islice(jobs, STRIP_BATCH))
+        if not batch:
+            return
+        yield from executor.map(fn, batch)
+
+
+# Writes the (x, y) coordinates of the selected pixels of source (a path or a
+# 2D uint8 array) to output_path, strip by strip, in row-major order and capped
+# at the first max_points (0 for all). threshold and invert binarize each strip
+# like cv2.threshold first. executor is anything with a map method, e.g. a
+# ProcessPoolExecutor. Returns the number of points written. Raises ValueError
+# for output formats other than OUTPUT_EXTENSIONS (e.g. .parquet).
+def extract_coordinates_tiled(source, output_path, color="black", low=None, high=None, threshold=None,
+                              invert=False, max_points=MAX_POINTS, strip_rows=STRIP_ROWS, executor=None,
+                              header=("x", "y")):
+    extension = _extension(output_path)
+    if extension not in OUTPUT_EXTENSIONS:
+        raise ValueError(f"Unsupported output format {extension!r} for tiled extraction; "
+                         f"use one of {', '.join(OUTPUT_EXTENSIONS)}")
+    mappable = isinstance(source, str) and _extension(source) in MAPPABLE_EXTENSIONS
+    image = open_grayscale(source) if isinstance(source, str) else source
+    options = (color, low, high, threshold, invert)
+    # Validate the options up front rather than in every worker
+    select_pixels(np.zeros((1, 1), dtype=np.uint8), color, low, high)
+
+    height = image.shape[0]
+    bounds = [(y0, min(y0 + strip_rows, height)) for y0 in range(0, height, strip_rows)]
+
+    def jobs(*extra):
+        for (y0, y1), *rest in zip(bounds, *extra):
+            yield (source if mappable else image[y0:y1], y0, y1, options, *rest)
+
+    counts = np.array(list(_map_batched(executor, _count_strip, jobs())), dtype=np.int64)
+    ends = np.cumsum(counts)
+    if max_points:
+        ends = np.minimum(ends, max_points)
+    counts = np.diff(ends, prepend=0)
+    starts = ends - counts
+    total = int(ends[-1]) if len(ends) else 0
+
+    output = os.fspath(output_path) if extension == ".npy" or extension in RAW_EXTENSIONS else None
+    if extension == ".npy":
+        # Allocates the file; the strips fill it in
+        np.lib.format.open_memmap(output, mode="w+", dtype=np.int32, shape=(total, 2))
+    elif output is not None:
+        with open(output, "wb") as f:
+            f.truncate(total * 8)
+
+    written = _map_batched(executor, _write_strip, jobs([output] * len(bounds), starts, counts))
+    if output is not None:
+        for _ in written:
+            pass
+    else:
+        with open(output_path, "w", newline="") as csvfile:
+            csvfile.write(",".join(header) + "\n")
+            for points in written:
+                csvfile.write(format_csv(points, header=None))
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract pixel coordinates from a very large image, strip by strip")
+    parser.add_argument("image", help="input image (.npy and 8-bit .pgm scans are memory-mapped)")
+    parser.add_argument("--color", choices=sorted(COLOR_LEVELS), default="black", help="pixel colour to extract")
+    parser.add_argument("--range", nargs=2, type=int, metavar=("LOW", "HIGH"),
+                        help="extract grey levels LOW..HIGH instead of one colour")
+    parser.add_argument("--threshold", type=int, help="binarize at this level first, like cv2.threshold")
+    parser.add_argument("--invert", action="store_true", help="binarize with THRESH_BINARY_INV")
+    parser.add_argument("--max-points", type=int, default=0, help="keep only the first N points (0 for all)")
+    parser.add_argument("--strip-rows", type=int, default=STRIP_ROWS, help="rows per strip")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0 to run in this process)")
+    parser.add_argument("-o", "--output", default="output.i32",
+                        help="output file: .npy, .i32/.bin/.raw (raw int32) or .csv")
+    args = parser.parse_args(argv)
+
+    low, high = args.range if args.range else (None, None)
+    options = dict(color=args.color, low=low, high=high, threshold=args.threshold, invert=args.invert,
+                   max_points=args.max_points, strip_rows=args.strip_rows, header=("X", "Y"))
+    if args.workers:
+        with ProcessPoolExecutor(args.workers) as executor:
+            total = extract_coordinates_tiled(args.image, args.output, executor=executor, **options)
+    else:
+        total = extract_coordinates_tiled(args.image, args.output, **options)
+    print(f"Extracted {total} coordinates and exported to '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
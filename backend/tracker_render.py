@@ -0,0 +1,108 @@
+import time
+
+import cv2
+import numpy as np
+
+from camera_pipeline import AsyncVideoWriter
+from point_overlay import PointOverlay
+
+# Moving-point tracker over a kolam point set.
+#
+# The points are shifted into the frame and converted to int32 once, and the
+# static red points are drawn once (see point_overlay). Each frame only draws
+# the path the moving point covered since the previous frame into a trail
+# mask, pastes the trail inside its bounding box and draws the marker, so the
+# per-frame cost does not grow with the number of points. render_offline plays
+# the whole animation onto a blank canvas without a camera and hands the
+# frames to a background video writer.
+
+
+class TrackerRenderer:
+    def __init__(self, points, radius=10, speed=100, padding=50, point_color=(0, 0, 255),
+                 marker_color=(255, 0, 0), trail_color=(0, 255, 0), trail_thickness=2):
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        if len(points) == 0:
+            raise ValueError("No points to track")
+        low = points.min(axis=0)
+        # Shifted by the minimum x and y values plus padding
+        self.points = (points - low + padding).astype(np.int32)
+        width, height = (points.max(axis=0) - low + 2 * padding).tolist()
+        self.size = (int(width), int(height))
+        self.radius = radius
+        self.speed = speed
+        self.marker_color = marker_color
+        self.trail_color = trail_color
+        self.trail_thickness = trail_thickness
+        self.overlay = PointOverlay(self.points, radius, point_color, -1)
+        self.row = 0
+        self._trail = None
+        self._trail_box = None
+
+    def reset_trail(self):
+        if self._trail is not None:
+            self._trail[:] = 0
+        self._trail_box = None
+
+    # Draws the points, the trail and the moving point onto frame in place
+    def render(self, frame):
+        if self._trail is None or self._trail.shape != frame.shape[:2]:
+            self._trail = np.zeros(frame.shape[:2], dtype=np.uint8)
+            self._trail_box = None
+        self.overlay.composite(frame)
+        if self._trail_box is not None:
+            x0, y0, x1, y1 = self._trail_box
+            target = frame[y0:y1, x0:x1]
+            cv2.copyTo(np.full_like(target, self.trail_color), self._trail[y0:y1, x0:x1], target)
+        current_x, current_y = self.points[self.row].tolist()
+        cv2.circle(frame, (current_x, current_y), self.radius + 5, self.marker_color, -1)
+        return frame
+
+    # Moves the point on by speed rows, extending the trail along the rows it
+    # passes; wrapping round to the start clears the trail
+    def advance(self):
+        previous = self.row
+        self.row += self.speed
+        if self.row >= len(self.points):
+            self.row = 0
+        elif self.row < 0:
+            self.row = len(self.points) - 1
+        if self.row <= previous or self._trail is None:
+            self.reset_trail()
+            return
+        path = self.points[previous:self.row + 1]
+        cv2.polylines(self._trail, [path.reshape(-1, 1, 2)], False, 255, self.trail_thickness)
+
+        # Grow the trail's bounding box by the new segment, clipped to the frame
+        height, width = self._trail.shape
+        margin = self.trail_thickness
+        x0, y0 = np.maximum(path.min(axis=0) - margin, 0).tolist()
+        x1, y1 = (path.max(axis=0) + margin + 1).tolist()
+        x1, y1 = min(x1, width), min(y1, height)
+        if self._trail_box is not None:
+            bx0, by0, bx1, by1 = self._trail_box
+            x0, y0, x1, y1 = min(x0, bx0), min(y0, by0), max(x1, bx1), max(y1, by1)
+        if x0 < x1 and y0 < y1:
+            self._trail_box = (x0, y0, x1, y1)
+
+    # Renders one pass of the moving point over all the points, on a plain
+    # background the size of the point set, to a video file. Returns the frame
+    # count and how much faster than real time it ran.
+    def render_offline(self, output, fps=30.0, background=(255, 255, 255), fourcc="mp4v"):
+        if self.speed <= 0:
+            raise ValueError("Offline rendering needs a positive speed")
+        width, height = self.size
+        canvas = np.empty((height, width, 3), dtype=np.uint8)
+        canvas[:] = background
+        self.row = 0
+        self._trail = np.zeros((height, width), dtype=np.uint8)
+        self._trail_box = None
+        frames = -(-len(self.points) // self.speed)
+
+        start = time.perf_counter()
+        with AsyncVideoWriter(output, fps, fourcc) as writer:
+            for _ in range(frames):
+                writer.write(self.render(canvas.copy()))
+                self.advance()
+        elapsed = time.perf_counter() - start
+        return {"frames": frames, "seconds": round(elapsed, 2),
+                "realtime_factor": round(frames / fps / elapsed, 1) if elapsed > 0 else 0.0}